@@ -0,0 +1,134 @@
+"""
+Volume engine benchmark
+Times the mesh and raster engines of FoodWeightEstimator on synthetic food
+polygons of several sizes and point counts, and compares their volumes with a
+reference: the Gaussian dome integrated on a supersampled pixel grid
+"""
+
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from food_weight import ENGINES, FoodWeightEstimator  # noqa: E402
+from pipeline import git_revision, random_polygon, summarize  # noqa: E402
+
+HEIGHT_CM = 3.0
+PIXELS_PER_CM = 20.0
+
+
+def reference_volume(estimator: FoodWeightEstimator, polygon: np.ndarray, supersample: int) -> float:
+    """Dome volume on a grid supersample times finer in each direction"""
+    return estimator.raster_volume(polygon * supersample, HEIGHT_CM, PIXELS_PER_CM * supersample)
+
+
+def run_case(radius: float, n_points: int, polygons: int, repeat: int, supersample: int,
+             estimator_kwargs: Dict, seed: int = 0) -> Dict:
+    """Time both engines on one polygon configuration and measure their relative errors"""
+    rng = np.random.default_rng(seed)
+    image_size = (int(4 * radius) + 16, int(4 * radius) + 16)
+    center = (image_size[0] / 2, image_size[1] / 2)
+    samples = [random_polygon(rng, center, radius, n_points).astype(np.int32) for _ in range(polygons)]
+
+    estimator = FoodWeightEstimator(**estimator_kwargs)
+    references = [reference_volume(estimator, polygon, supersample) for polygon in samples]
+
+    engines = {}
+    for engine in ENGINES:
+        latencies = []
+        errors = []
+        for polygon, reference in zip(samples, references):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                volume, _ = estimator.estimate_volume(polygon, image_size, HEIGHT_CM, PIXELS_PER_CM, engine=engine)
+                latencies.append(time.perf_counter() - start)
+            errors.append(volume / reference - 1 if reference > 0 else 0.0)
+
+        errors = np.array(errors)
+        engines[engine] = dict(
+            summarize(latencies),
+            mean_rel_error=float(errors.mean()),
+            max_abs_rel_error=float(np.abs(errors).max()),
+        )
+
+    return {
+        'config': {
+            'radius_px': radius,
+            'points': n_points,
+            'polygons': polygons,
+            'repeat': repeat,
+            'supersample': supersample,
+        },
+        'engines': engines,
+    }
+
+
+def run(radii: List[float], points: List[int], polygons: int, repeat: int, supersample: int,
+        estimator_kwargs: Dict, seed: int = 0) -> Dict:
+    """Run the benchmark matrix and return the report"""
+    cases = []
+    for radius in radii:
+        for n_points in points:
+            case = run_case(radius, n_points, polygons, repeat, supersample, estimator_kwargs, seed)
+            cases.append(case)
+            line = " ".join(
+                f"{engine} {stats['p50_ms']:.3f} ms ({stats['mean_rel_error']:+.2%})"
+                for engine, stats in case['engines'].items()
+            )
+            print(f"radius={radius:g} points={n_points}: {line}", file=sys.stderr)
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'numpy': np.__version__,
+            'estimator': estimator_kwargs,
+            'height_cm': HEIGHT_CM,
+            'pixels_per_cm': PIXELS_PER_CM,
+            'seed': seed,
+        },
+        'cases': cases,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mesh vs raster volume engine benchmark')
+    parser.add_argument('--radii', type=float, nargs='+', default=[10, 50, 200, 800],
+                       help='Polygon radii in pixels')
+    parser.add_argument('--points', type=int, nargs='+', default=[64, 512, 2000], help='Points per polygon')
+    parser.add_argument('--polygons', type=int, default=5, help='Random polygons per case')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per polygon and engine')
+    parser.add_argument('--supersample', type=int, default=8, help='Reference grid refinement factor')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for synthetic polygons')
+    parser.add_argument('--simplify-max-error', type=float, default=None, help='Estimator simplify_max_error')
+    parser.add_argument('--simplify-max-vertices', type=int, default=None, help='Estimator simplify_max_vertices')
+    parser.add_argument('--output', '-o', default='bench_engines.json', help='JSON report file')
+
+    args = parser.parse_args()
+
+    logging.getLogger('food_weight').setLevel(logging.WARNING)
+
+    report = run(
+        radii=args.radii,
+        points=args.points,
+        polygons=args.polygons,
+        repeat=args.repeat,
+        supersample=args.supersample,
+        estimator_kwargs={
+            'simplify_max_error': args.simplify_max_error,
+            'simplify_max_vertices': args.simplify_max_vertices,
+        },
+        seed=args.seed
+    )
+
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"Report saved to {args.output}", file=sys.stderr)
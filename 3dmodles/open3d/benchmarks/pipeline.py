@@ -0,0 +1,311 @@
+"""
+Weight estimation pipeline benchmark
+Generates synthetic plates (images + YOLO segmentation labels) and times each
+stage of FoodWeightEstimator. Writes a JSON report (throughput, latency
+percentiles, per-stage peak allocations, per-case peak RSS) that can be
+compared between commits with --compare.
+Each case runs in a fresh process, so its peak RSS is its own; allocation peaks
+are measured with tracemalloc in a separate, untimed pass
+"""
+
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from food_weight import FoodWeightEstimator, process_directory  # noqa: E402
+
+STAGES = (
+    'parse_yolo_segmentation',
+    'decode',
+    'detect_food_type',
+    'create_mesh_from_polygon',
+    'calculate_volume',
+    'process_image',
+    'process_directory',
+)
+
+
+def random_polygon(rng: np.random.Generator, center: Tuple[float, float], radius: float,
+                   n_points: int) -> np.ndarray:
+    """Star-shaped blob with n_points vertices"""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n_points))
+    radii = radius * (1 + 0.15 * np.sin(3 * angles + rng.uniform(0, 2 * np.pi)))
+    radii *= rng.uniform(0.95, 1.05, n_points)
+    return np.column_stack([center[0] + radii * np.cos(angles), center[1] + radii * np.sin(angles)])
+
+
+def generate_dataset(root: Path, n_images: int, n_objects: int, n_points: int,
+                     resolution: Tuple[int, int], seed: int = 0) -> Tuple[Path, Path]:
+    """Write synthetic images and YOLO labels (one plate + n_objects food blobs each)"""
+    rng = np.random.default_rng(seed)
+    width, height = resolution
+    images_dir = root / 'images'
+    labels_dir = root / 'labels'
+    images_dir.mkdir(parents=True, exist_ok=True)
+    labels_dir.mkdir(parents=True, exist_ok=True)
+
+    for i in range(n_images):
+        image = np.full((height, width, 3), 60, dtype=np.uint8)
+        plate_radius = 0.45 * min(width, height)
+        plate = random_polygon(rng, (width / 2, height / 2), plate_radius, n_points)
+        cv2.fillPoly(image, [plate.astype(np.int32)], (225, 225, 225))
+
+        lines = [(0, plate)]
+        for k in range(n_objects):
+            angle = 2 * np.pi * k / max(n_objects, 1)
+            center = (width / 2 + 0.5 * plate_radius * np.cos(angle),
+                      height / 2 + 0.5 * plate_radius * np.sin(angle))
+            food = random_polygon(rng, center, plate_radius / max(2.5, n_objects), n_points)
+            color = tuple(int(c) for c in rng.integers(40, 230, 3))
+            cv2.fillPoly(image, [food.astype(np.int32)], color)
+            lines.append((1, food))
+
+        cv2.imwrite(str(images_dir / f"{i}.jpg"), image)
+        with open(labels_dir / f"{i}.txt", 'w') as f:
+            for class_id, polygon in lines:
+                coords = (polygon / [width, height]).clip(0, 1).ravel()
+                f.write(f"{class_id} " + " ".join(f"{c:.6f}" for c in coords) + " 0.95\n")
+
+    return images_dir, labels_dir
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (run_case is given a fresh process)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(latencies: List[float]) -> Dict:
+    """Throughput and latency percentiles for a list of call durations (seconds)"""
+    values = np.array(latencies)
+    total = float(values.sum())
+    return {
+        'calls': len(values),
+        'total_s': total,
+        'throughput_per_s': len(values) / total if total > 0 else None,
+        'p50_ms': float(np.percentile(values, 50) * 1000),
+        'p90_ms': float(np.percentile(values, 90) * 1000),
+        'p99_ms': float(np.percentile(values, 99) * 1000),
+    }
+
+
+def timed(fn: Callable, latencies: List[float]):
+    """Call fn, append its duration to latencies and return its result"""
+    start = time.perf_counter()
+    result = fn()
+    latencies.append(time.perf_counter() - start)
+    return result
+
+
+def traced(fn: Callable, peaks: List[float]):
+    """Call fn, append its peak traced allocation (MB above the live size at the start) to peaks"""
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    peaks.append((tracemalloc.get_traced_memory()[1] - base) / (1024 * 1024))
+    return result
+
+
+def run_pass(estimator: FoodWeightEstimator, pairs: List[Tuple[str, str]], root: Path,
+             resolution: Tuple[int, int], estimator_kwargs: Dict, record: Callable):
+    """One pass over the dataset; record(stage, fn) calls fn and measures it"""
+    width, height = resolution
+    for image_path, label_path in pairs:
+        objects = record('parse_yolo_segmentation', lambda: estimator.parse_yolo_segmentation(label_path, width, height))
+        image = record('decode', lambda: estimator.load_image(image_path))
+
+        foods = [obj['polygon'] for obj in objects if obj['class_name'] == 'food']
+        plate = next(obj['polygon'] for obj in objects if obj['class_name'] == 'plate')
+        pixels_per_cm = estimator.calibrate_from_plate(plate, width, height, estimator.plate_diameter_cm)
+
+        def classify():
+            stats = estimator.compute_image_stats(foods, image, width, height)
+            return [estimator.detect_food_type(p, s, width, height) for p, s in zip(foods, stats)]
+
+        food_types = record('detect_food_type', classify)
+
+        for polygon, (_, height_cm) in zip(foods, food_types):
+            mesh = record('create_mesh_from_polygon', lambda: estimator.create_mesh_from_polygon(
+                polygon, (width, height), height_cm, pixels_per_cm))
+            record('calculate_volume', lambda: estimator.calculate_volume(mesh))
+
+        record('process_image', lambda: estimator.process_image(image_path, label_path))
+
+    images_dir, labels_dir = Path(pairs[0][0]).parent, Path(pairs[0][1]).parent
+    record('process_directory', lambda: process_directory(str(images_dir), str(labels_dir), str(root / 'results'),
+                                                          **estimator_kwargs))
+
+
+def run_case(n_images: int, n_objects: int, n_points: int, resolution: Tuple[int, int],
+             repeat: int, estimator_kwargs: Dict, seed: int = 0) -> Dict:
+    """Benchmark every stage on one synthetic dataset configuration (meant to run in a fresh process)"""
+    # Per-image INFO logs would dominate the timings; set here since cases run in spawned processes
+    logging.getLogger('food_weight').setLevel(logging.WARNING)
+    estimator = FoodWeightEstimator(**estimator_kwargs)
+    width, height = resolution
+    latencies = {stage: [] for stage in STAGES}
+    peaks = {stage: [] for stage in STAGES}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        images_dir, labels_dir = generate_dataset(root, n_images, n_objects, n_points, resolution, seed)
+        pairs = [(str(images_dir / f"{i}.jpg"), str(labels_dir / f"{i}.txt")) for i in range(n_images)]
+
+        for _ in range(repeat):
+            run_pass(estimator, pairs, root, resolution, estimator_kwargs,
+                     lambda stage, fn: timed(fn, latencies[stage]))
+        # RSS before tracing: tracemalloc's own bookkeeping would inflate it
+        case_peak_rss = peak_rss_mb()
+
+        tracemalloc.start()
+        try:
+            run_pass(estimator, pairs, root, resolution, estimator_kwargs,
+                     lambda stage, fn: traced(fn, peaks[stage]))
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'config': {
+            'images': n_images,
+            'objects': n_objects,
+            'points': n_points,
+            'resolution': f"{width}x{height}",
+            'repeat': repeat,
+        },
+        'peak_rss_mb': case_peak_rss,
+        'stages': {
+            stage: dict(summarize(values), peak_alloc_mb=max(peaks[stage]) if peaks[stage] else None)
+            for stage, values in latencies.items() if values
+        },
+    }
+
+
+def run_case_isolated(*args) -> Dict:
+    """run_case in a fresh spawned process, so peak RSS covers this case only"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_case, *args).result()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(images: int, objects: List[int], points: List[int], resolutions: List[Tuple[int, int]],
+        repeat: int, estimator_kwargs: Dict, seed: int = 0) -> Dict:
+    """Run the benchmark matrix and return the report"""
+    cases = []
+    for resolution in resolutions:
+        for n_objects in objects:
+            for n_points in points:
+                case = run_case_isolated(images, n_objects, n_points, resolution, repeat, estimator_kwargs, seed)
+                cases.append(case)
+                config = case['config']
+                print(f"{config['resolution']} objects={n_objects} points={n_points}: "
+                      f"process_image p50 {case['stages']['process_image']['p50_ms']:.2f} ms, "
+                      f"peak RSS {case['peak_rss_mb']:.1f} MB", file=sys.stderr)
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'platform': platform.platform(),
+            'estimator': estimator_kwargs,
+            'seed': seed,
+        },
+        'cases': cases,
+    }
+
+
+def case_key(config: Dict) -> Tuple:
+    """Cases are matched on workload shape, not on how often they were repeated"""
+    return config['resolution'], config['objects'], config['points']
+
+
+def compare(report: Dict, baseline: Dict) -> List[str]:
+    """Per stage p50 latency ratio (current / baseline) and peak memory for matching cases"""
+    baseline_cases = {case_key(c['config']): c for c in baseline['cases']}
+    lines = []
+    for case in report['cases']:
+        key = case_key(case['config'])
+        if key not in baseline_cases:
+            continue
+        config = case['config']
+        base_case = baseline_cases[key]
+        line = f"{config['resolution']} objects={config['objects']} points={config['points']}"
+        if base_case.get('peak_rss_mb') is not None:
+            line += f" peak RSS {base_case['peak_rss_mb']:.1f} -> {case['peak_rss_mb']:.1f} MB"
+        lines.append(line)
+        for stage, stats in case['stages'].items():
+            base = base_case['stages'].get(stage)
+            if base and base['p50_ms'] > 0:
+                line = (f"  {stage:26s} {base['p50_ms']:9.3f} -> {stats['p50_ms']:9.3f} ms "
+                        f"(x{stats['p50_ms'] / base['p50_ms']:.2f})")
+                if base.get('peak_alloc_mb') is not None and stats.get('peak_alloc_mb') is not None:
+                    line += f", alloc {base['peak_alloc_mb']:.2f} -> {stats['peak_alloc_mb']:.2f} MB"
+                lines.append(line)
+    return lines
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Weight estimation pipeline benchmark')
+    parser.add_argument('--images', type=int, default=5, help='Synthetic images per case')
+    parser.add_argument('--objects', type=int, nargs='+', default=[3], help='Food objects per image')
+    parser.add_argument('--points', type=int, nargs='+', default=[64, 512, 2000], help='Points per polygon')
+    parser.add_argument('--resolutions', type=parse_resolution, nargs='+',
+                       default=[(1280, 960), (4000, 3000)], help='Image resolutions, WIDTHxHEIGHT')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over each dataset')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for synthetic data')
+    parser.add_argument('--stats-mode', default='roi', help='Estimator stats_mode')
+    parser.add_argument('--decode-scale', type=int, default=1, help='Estimator decode_scale')
+    parser.add_argument('--engine', default='mesh', help='Estimator volume engine (mesh or raster)')
+    parser.add_argument('--output', '-o', default='bench_pipeline.json', help='JSON report file')
+    parser.add_argument('--compare', default=None, help='Baseline JSON report to compare against')
+
+    args = parser.parse_args()
+
+    report = run(
+        images=args.images,
+        objects=args.objects,
+        points=args.points,
+        resolutions=args.resolutions,
+        repeat=args.repeat,
+        estimator_kwargs={'stats_mode': args.stats_mode, 'decode_scale': args.decode_scale, 'engine': args.engine},
+        seed=args.seed
+    )
+
+    Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"Report saved to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print("\n".join(compare(report, json.load(f))))
@@ -0,0 +1,102 @@
+"""
+Cold start benchmark for the modeling service
+Measures, in fresh interpreter processes, the time to import food_weight,
+to import server and the latency of the first /model request
+"""
+
+import json
+import math
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+# Runs inside a fresh interpreter; PRELOAD lets us emulate eager imports (e.g. open3d)
+CHILD_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, {service_dir!r})
+
+t0 = time.perf_counter()
+for name in {preload!r}:
+    __import__(name)
+t1 = time.perf_counter()
+import food_weight
+t2 = time.perf_counter()
+import server
+t3 = time.perf_counter()
+
+from fastapi.testclient import TestClient
+client = TestClient(server.app)
+t4 = time.perf_counter()
+response = client.post('/model', json={payload!r})
+t5 = time.perf_counter()
+response.raise_for_status()
+
+print(json.dumps({{
+    'preload_s': t1 - t0,
+    'import_food_weight_s': t2 - t1,
+    'import_server_s': t3 - t2,
+    'first_request_s': t5 - t4,
+    'open3d_loaded': 'open3d' in sys.modules,
+}}))
+'''
+
+
+def synthetic_request(width: int = 1280, height: int = 960) -> Dict:
+    """Plate with two food blobs, as produced by the segmentation service"""
+    def circle(cx, cy, r, n=64):
+        return [[cx + r * math.cos(2 * math.pi * i / n), cy + r * math.sin(2 * math.pi * i / n)]
+                for i in range(n)]
+    
+    return {
+        'width': width,
+        'height': height,
+        'segments': [
+            {'class_name': 'plate', 'polygon': circle(width / 2, height / 2, 0.4 * height)},
+            {'class_name': 'rice', 'polygon': circle(width / 2 - 120, height / 2, 100)},
+            {'class_name': 'chicken', 'polygon': circle(width / 2 + 120, height / 2, 80)},
+        ]
+    }
+
+
+def run_once(preload: List[str]) -> Dict:
+    """Run one cold start measurement in a fresh interpreter"""
+    script = CHILD_SCRIPT.format(service_dir=str(SERVICE_DIR), preload=list(preload),
+                                 payload=synthetic_request())
+    output = subprocess.run([sys.executable, '-c', script], cwd=SERVICE_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(repeat: int = 5, preload: List[str] = ()) -> Dict:
+    """Repeat cold starts and report min/median per measurement"""
+    runs = [run_once(preload) for _ in range(repeat)]
+    
+    report = {'repeat': repeat, 'preload': list(preload), 'open3d_loaded': runs[0]['open3d_loaded']}
+    for key in ('preload_s', 'import_food_weight_s', 'import_server_s', 'first_request_s'):
+        values = [r[key] for r in runs]
+        report[key] = {'min': min(values), 'median': statistics.median(values)}
+    
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Modeling service cold start benchmark')
+    parser.add_argument('--repeat', '-n', type=int, default=5, help='Number of fresh processes')
+    parser.add_argument('--preload', nargs='*', default=[],
+                       help='Modules imported before food_weight (e.g. open3d to emulate eager loading)')
+    parser.add_argument('--output', '-o', default=None, help='Write JSON report to this file')
+    
+    args = parser.parse_args()
+    
+    report = run(repeat=args.repeat, preload=args.preload)
+    text = json.dumps(report, indent=2)
+    print(text)
+    
+    if args.output:
+        Path(args.output).write_text(text, encoding='utf-8')
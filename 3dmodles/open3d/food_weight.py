@@ -5,17 +5,30 @@ Processes images with YOLO segmentation labels and calculates 3D volume/weight
 
 import cv2
 import numpy as np
-import open3d as o3d
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 import json
 import logging
-from dataclasses import dataclass, asdict
+import os
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from instrumentation import NULL_TIMER, Instrumentation
+from result_cache import ResultCache, hash_file, hit_ratio
+from results_table import ResultsTable
+
+if TYPE_CHECKING:
+    import open3d as o3d
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+# Bump whenever a change alters estimation results, so cached results are not reused
+ESTIMATOR_VERSION = '3'
+
 # Food density database (g/cm³)
 FOOD_DENSITY = {
     'rice': 0.85,
@@ -34,6 +47,41 @@ FOOD_DENSITY = {
 CLASS_NAMES = {0: 'plate', 1: 'food', 2: 'glass'}
 
 
+def _open3d():
+    """
+    Import Open3D on demand
+    It is only needed for visualization and mesh export, and is slow to import
+    """
+    try:
+        import open3d as o3d
+    except ImportError as e:
+        raise ImportError("open3d is required for mesh visualization/export: pip install open3d") from e
+    return o3d
+
+# How per-object pixel statistics are computed:
+#   roi       - one bounding-rect mask per object
+#   label_map - all objects rasterized once into a label image, stats via bincount
+STATS_MODES = ('roi', 'label_map')
+
+# How object volumes are computed:
+#   mesh   - Gaussian dome triangle mesh (simplified polygon), divergence theorem
+#   raster - the same dome integrated directly over the polygon's pixel grid, no mesh
+ENGINES = ('mesh', 'raster')
+
+# Adaptive simplification candidates: approxPolyDP epsilon as a fraction of arc length (0 = none)
+SIMPLIFY_LEVELS = (0.0, 0.00025, 0.0005, 0.001, 0.002, 0.004, 0.006, 0.008, 0.01, 0.012, 0.014, 0.016)
+# Simplification never goes below this many points (a dense blob must not collapse to a quad)
+SIMPLIFY_MIN_VERTICES = 8
+
+# Image decode scale -> OpenCV reduced-decode flag (JPEG decodes at 1/2, 1/4, 1/8 natively)
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
 @dataclass
 class FoodResult:
     """Result data structure"""
@@ -49,40 +97,267 @@ class FoodResult:
     area_pixels: int
     center_x: float
     center_y: float
+    mesh_points: int = 0
+    simplify_level: float = 0.0
+    simplify_error: float = 0.0
+
+
+# FoodResult fields as ResultsTable columns (str columns are dictionary-encoded)
+RESULT_COLUMNS = {
+    'image_path': str,
+    'object_id': np.int32,
+    'class_id': np.int16,
+    'food_type': str,
+    'volume_cm3': np.float64,
+    'weight_g': np.float64,
+    'weight_kg': np.float64,
+    'density_g_cm3': np.float64,
+    'polygon_points': np.int32,
+    'area_pixels': np.int64,
+    'center_x': np.float64,
+    'center_y': np.float64,
+    'mesh_points': np.int32,
+    'simplify_level': np.float64,
+    'simplify_error': np.float64,
+}
+
+
+def new_results_table(capacity: int = 1024) -> ResultsTable:
+    """Empty columnar table of FoodResult rows"""
+    return ResultsTable(RESULT_COLUMNS, capacity)
+
+
+@dataclass
+class RegionStats:
+    """Pixel statistics of a segmented region"""
+    area_pixels: int
+    avg_color: Optional[np.ndarray]
+    avg_brightness: float
+
+
+@dataclass
+class FoodMesh:
+    """Lightweight triangle mesh (plain vertex/triangle arrays, meters)"""
+    vertices: np.ndarray
+    triangles: np.ndarray
+    simplify_level: float = 0.0
+    simplify_error: float = 0.0
+    
+    def to_open3d(self, color: Optional[List[float]] = None) -> 'o3d.geometry.TriangleMesh':
+        """Build an Open3D mesh (only needed for visualization/export)"""
+        o3d = _open3d()
+        mesh = o3d.geometry.TriangleMesh()
+        mesh.vertices = o3d.utility.Vector3dVector(self.vertices)
+        mesh.triangles = o3d.utility.Vector3iVector(self.triangles)
+        mesh.compute_vertex_normals()
+        mesh.paint_uniform_color(color or [0.6, 0.4, 0.8])
+        return mesh
+
+
+def dome_volume(polygon: np.ndarray, origin: Tuple[float, float] = (0.0, 0.0), height: float = 1.0) -> float:
+    """
+    Signed volume of the dome mesh create_mesh_from_polygon builds for polygon
+    (placed relative to origin, in polygon units² x height), in closed form:
+    bottom fan triangles lie in z=0 and contribute nothing; each edge i -> i+1
+    contributes through its two side triangles and its top fan triangle
+    """
+    p = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+    x = p[:, 0] - origin[0]
+    y = p[:, 1] - origin[1]
+    center_x, center_y = x.mean(), y.mean()
+    
+    dist_sq = (x - center_x) ** 2 + (y - center_y) ** 2
+    max_dist_sq = dist_sq.max()
+    z = height * np.exp(-dist_sq / max_dist_sq) if max_dist_sq > 0 else np.full(len(x), height)
+    
+    x_next = np.concatenate((x[1:], x[:1]))
+    y_next = np.concatenate((y[1:], y[:1]))
+    z_next = np.concatenate((z[1:], z[:1]))
+    edge_cross = x * y_next - y * x_next
+    
+    volume = (
+        np.dot(edge_cross, z + z_next + height)
+        + center_x * (np.dot(y, z_next) - np.dot(z, y_next))
+        + center_y * (np.dot(z, x_next) - np.dot(x, z_next))
+    )
+    return volume / 6.0
+
+
+def pack_meshes(meshes: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pack ragged (vertices, triangles) pairs into flat arrays
+    Returns concatenated vertices, re-indexed triangles and per-triangle mesh index
+    """
+    vertex_counts = np.array([len(v) for v, _ in meshes], dtype=np.int64)
+    triangle_counts = np.array([len(t) for _, t in meshes], dtype=np.int64)
+    vertex_offsets = np.concatenate([[0], np.cumsum(vertex_counts)[:-1]])
+    
+    vertices = np.concatenate([np.asarray(v, dtype=np.float64).reshape(-1, 3) for v, _ in meshes])
+    triangles = np.concatenate([np.asarray(t, dtype=np.int64).reshape(-1, 3) for _, t in meshes])
+    mesh_index = np.repeat(np.arange(len(meshes)), triangle_counts)
+    triangles = triangles + vertex_offsets[mesh_index][:, None]
+    
+    return vertices, triangles, mesh_index
+
+
+def signed_volumes(vertices: np.ndarray, triangles: np.ndarray,
+                   mesh_index: Optional[np.ndarray] = None, n_meshes: int = 1) -> np.ndarray:
+    """
+    Signed volume of triangle meshes (divergence theorem), all triangles at once
+    mesh_index assigns each triangle to a mesh when several meshes are packed together
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    triangles = np.asarray(triangles)
+    
+    v0 = vertices[triangles[:, 0]]
+    v1 = vertices[triangles[:, 1]]
+    v2 = vertices[triangles[:, 2]]
+    tetra = np.einsum('ij,ij->i', v0, np.cross(v1, v2)) / 6.0
+    
+    if mesh_index is None:
+        return np.array([tetra.sum()])
+    
+    return np.bincount(mesh_index, weights=tetra, minlength=n_meshes)
+
+
+def parse_yolo_text(text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse YOLO segmentation label text into flat arrays
+    Line format: class_id x1 y1 x2 y2 ... confidence (normalized coordinates)
+    Returns class_ids (int32), point offsets per object (int64, len n+1)
+    and normalized coords (float64, flat x/y pairs)
+    """
+    class_ids = []
+    counts = []
+    values = []
+    
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 7:
+            continue
+        
+        # Skip class id and confidence score, drop a dangling odd coordinate
+        n_points = (len(parts) - 2) // 2
+        if n_points < 3:
+            continue
+        
+        class_ids.append(int(parts[0]))
+        counts.append(n_points)
+        values.extend(parts[1:1 + 2 * n_points])
+    
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    
+    return (
+        np.array(class_ids, dtype=np.int32),
+        offsets,
+        np.array(values, dtype=np.float64)
+    )
+
+
+def read_image_size(image_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from the image header without decoding pixels
+    Accounts for EXIF orientation the way cv2.imread does.
+    Returns None if the header cannot be read
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+            orientation = img.getexif().get(0x0112, 1)
+    except Exception:
+        return None
+    
+    # Orientations 5-8 are transposed (rotated by 90°)
+    if orientation in (5, 6, 7, 8):
+        width, height = height, width
+    
+    return width, height
 
 
 class FoodWeightEstimator:
     """Main estimator class"""
     
-    def __init__(self, plate_diameter_cm: float = 24.0):
+    def __init__(self, plate_diameter_cm: float = 24.0, stats_mode: str = 'roi',
+                 label_cache: bool = False, decode_scale: int = 1, instrument: bool = False,
+                 track_allocations: bool = False, cache_dir: Optional[str] = None,
+                 cache_max_mb: float = 1024, simplify_max_error: Optional[float] = None,
+                 simplify_max_vertices: Optional[int] = None, engine: str = 'mesh',
+                 simplify_report_error: bool = False):
+        if stats_mode not in STATS_MODES:
+            raise ValueError(f"Unknown stats_mode: {stats_mode} (expected one of {STATS_MODES})")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine} (expected one of {ENGINES})")
+        if decode_scale not in DECODE_FLAGS:
+            raise ValueError(f"Unsupported decode_scale: {decode_scale} (expected one of {tuple(DECODE_FLAGS)})")
+        
         self.plate_diameter_cm = plate_diameter_cm
+        self.stats_mode = stats_mode
+        self.label_cache = label_cache
+        self.decode_scale = decode_scale
+        # Adaptive simplification bounds (both None = fixed legacy simplification)
+        self.simplify_max_error = simplify_max_error
+        self.simplify_max_vertices = simplify_max_vertices
+        # Volume error of the fixed simplification level (adaptive levels always compute it)
+        self.simplify_report_error = simplify_report_error
+        self.engine = engine
+        # Per-stage timings of process_image (no-op unless enabled)
+        self.instrumentation = Instrumentation(enabled=instrument, track_allocations=track_allocations)
+        # Results keyed by input content, shared between processes through cache_dir
+        self.result_cache = ResultCache(cache_dir, int(cache_max_mb * 1024 * 1024)) if cache_dir else None
+        
+    def load_yolo_labels(self, label_path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Load parsed labels (class_ids, offsets, coords), see parse_yolo_text
+        With label_cache enabled, parsed arrays are kept in a .npz next to the label
+        file and reused while the label's mtime and size are unchanged
+        """
+        if not self.label_cache:
+            with open(label_path, 'r') as f:
+                return parse_yolo_text(f.read())
+        
+        label_file = Path(label_path)
+        cache_file = label_file.with_suffix('.npz')
+        fingerprint = np.array(_file_fingerprint(label_file), dtype=np.int64)
+        
+        try:
+            with np.load(cache_file) as cached:
+                if np.array_equal(cached['fingerprint'], fingerprint):
+                    return cached['class_ids'], cached['offsets'], cached['coords']
+        except (OSError, KeyError, ValueError):
+            pass
+        
+        with open(label_file, 'r') as f:
+            class_ids, offsets, coords = parse_yolo_text(f.read())
+        
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'wb') as f:
+                np.savez(f, fingerprint=fingerprint, class_ids=class_ids, offsets=offsets, coords=coords)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.debug(f"Could not write label cache {cache_file}: {e}")
         
+        return class_ids, offsets, coords
+    
     def parse_yolo_segmentation(self, label_path: str, img_width: int, img_height: int) -> List[Dict]:
         """Parse YOLO segmentation format"""
-        objects = []
+        class_ids, offsets, coords = self.load_yolo_labels(label_path)
         
-        with open(label_path, 'r') as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) < 7:
-                    continue
-                
-                class_id = int(parts[0])
-                coords = list(map(float, parts[1:-1]))  # Skip confidence score
-                
-                points = []
-                for i in range(0, len(coords), 2):
-                    if i + 1 < len(coords):
-                        x = int(coords[i] * img_width)
-                        y = int(coords[i + 1] * img_height)
-                        points.append([x, y])
-                
-                if len(points) >= 3:
-                    objects.append({
-                        'class_id': class_id,
-                        'class_name': CLASS_NAMES.get(class_id, f'class_{class_id}'),
-                        'polygon': np.array(points, dtype=np.int32)
-                    })
+        points = (coords.reshape(-1, 2) * np.array([img_width, img_height])).astype(np.int32)
+        
+        objects = []
+        for i, class_id in enumerate(class_ids.tolist()):
+            objects.append({
+                'class_id': class_id,
+                'class_name': CLASS_NAMES.get(class_id, f'class_{class_id}'),
+                'polygon': points[offsets[i]:offsets[i + 1]]
+            })
         
         return objects
     
@@ -105,26 +380,127 @@ class FoodWeightEstimator:
         
         return pixels_per_cm
     
-    def detect_food_type(self, polygon: np.ndarray, image: np.ndarray, mask: np.ndarray, 
-                        img_width: int, img_height: int) -> Tuple[str, float]:
+    def polygon_roi_mask(self, polygon: np.ndarray, img_width: int,
+                         img_height: int) -> Tuple[np.ndarray, Tuple[slice, slice]]:
         """
-        Detect food type from segmentation
-        Uses position, color, and shape characteristics
+        Rasterize polygon into a mask covering only its bounding rect
+        Returns the mask and the (rows, cols) slices of the rect within the image
         """
+        x, y, bw, bh = cv2.boundingRect(polygon)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + bw, img_width), min(y + bh, img_height)
+        
+        mask = np.zeros((max(y1 - y0, 0), max(x1 - x0, 0)), dtype=np.uint8)
+        if mask.size:
+            cv2.fillPoly(mask, [polygon], 255, offset=(-x0, -y0))
+        
+        return mask, (slice(y0, y1), slice(x0, x1))
+    
+    def compute_region_stats(self, polygon: np.ndarray, image: np.ndarray) -> RegionStats:
+        """Area and mean colour of the polygon region, computed on its bounding rect only"""
         h, w = image.shape[:2]
-        center_x = np.mean(polygon[:, 0]) / w
-        center_y = np.mean(polygon[:, 1]) / h
+        mask, roi = self.polygon_roi_mask(polygon, w, h)
         
-        # Extract color from masked region
-        masked_region = image[mask > 0]
+        masked_region = image[roi][mask > 0]
         if len(masked_region) > 0:
             avg_color = np.mean(masked_region, axis=0)
-            avg_brightness = np.mean(avg_color)
+            avg_brightness = float(np.mean(avg_color))
         else:
-            avg_brightness = 128
+            avg_color = None
+            avg_brightness = 128.0
+        
+        return RegionStats(
+            area_pixels=len(masked_region),
+            avg_color=avg_color,
+            avg_brightness=avg_brightness
+        )
+    
+    def compute_label_map_stats(self, polygons: List[np.ndarray], image: np.ndarray) -> List[RegionStats]:
+        """
+        Rasterize all polygons once into an integer label image and reduce
+        per-object area/colour with bincount (one pass over the covered pixels).
+        Overlapping pixels belong to the polygon drawn last.
+        """
+        if not polygons:
+            return []
+        
+        h, w = image.shape[:2]
+        
+        # Only the union of the bounding rects needs labelling
+        x, y, bw, bh = cv2.boundingRect(np.vstack(polygons))
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + bw, w), min(y + bh, h)
+        n = len(polygons)
+        
+        if x1 <= x0 or y1 <= y0:
+            return [RegionStats(area_pixels=0, avg_color=None, avg_brightness=128.0) for _ in polygons]
+        
+        label_map = np.zeros((y1 - y0, x1 - x0), dtype=np.int32)
+        for label, polygon in enumerate(polygons, start=1):
+            cv2.fillPoly(label_map, [polygon], label, offset=(-x0, -y0))
+        
+        labels = label_map.ravel()
+        pixels = image[y0:y1, x0:x1].reshape(len(labels), -1)
+        
+        counts = np.bincount(labels, minlength=n + 1)
+        color_sums = np.stack([
+            np.bincount(labels, weights=pixels[:, c], minlength=n + 1)
+            for c in range(pixels.shape[1])
+        ], axis=1)
+        
+        stats = []
+        for label in range(1, n + 1):
+            area_pixels = int(counts[label])
+            if area_pixels > 0:
+                avg_color = color_sums[label] / area_pixels
+                avg_brightness = float(np.mean(avg_color))
+            else:
+                avg_color = None
+                avg_brightness = 128.0
+            stats.append(RegionStats(area_pixels=area_pixels, avg_color=avg_color,
+                                     avg_brightness=avg_brightness))
+        
+        return stats
+    
+    def compute_objects_stats(self, polygons: List[np.ndarray], image: np.ndarray) -> List[RegionStats]:
+        """Pixel statistics for every polygon using the configured stats_mode"""
+        if self.stats_mode == 'label_map':
+            return self.compute_label_map_stats(polygons, image)
+        return [self.compute_region_stats(polygon, image) for polygon in polygons]
+    
+    def compute_image_stats(self, polygons: List[np.ndarray], image: np.ndarray,
+                            img_width: int, img_height: int) -> List[RegionStats]:
+        """
+        Pixel statistics for polygons given in full-resolution coordinates
+        The image may be decoded at a reduced size; polygons are mapped onto it
+        and areas are scaled back to full-resolution pixels
+        """
+        scale_x = image.shape[1] / img_width
+        scale_y = image.shape[0] / img_height
+        if scale_x == 1 and scale_y == 1:
+            return self.compute_objects_stats(polygons, image)
+        
+        scale = np.array([scale_x, scale_y])
+        scaled = [(polygon * scale).astype(np.int32) for polygon in polygons]
+        stats = self.compute_objects_stats(scaled, image)
+        for item in stats:
+            item.area_pixels = int(round(item.area_pixels / (scale_x * scale_y)))
+        
+        return stats
+    
+    def detect_food_type(self, polygon: np.ndarray, stats: RegionStats,
+                        img_width: int, img_height: int) -> Tuple[str, float]:
+        """
+        Detect food type from segmentation
+        Uses position, color, and shape characteristics
+        """
+        center_x = np.mean(polygon[:, 0]) / img_width
+        center_y = np.mean(polygon[:, 1]) / img_height
+        
+        avg_brightness = stats.avg_brightness
         
         # Calculate area and aspect ratio
-        area_pixels = np.sum(mask > 0)
+        area_pixels = stats.area_pixels
         bbox = cv2.boundingRect(polygon)
         aspect_ratio = bbox[2] / max(bbox[3], 1)
         
@@ -148,16 +524,102 @@ class FoodWeightEstimator:
         # Default
         return 'cabbage', 4.0
     
+    def simplify_polygon(self, polygon: np.ndarray,
+                         image_size: Tuple[int, int]) -> Tuple[np.ndarray, float, float]:
+        """
+        Simplify polygon before meshing
+        Returns (polygon, level, relative volume error). The level is the
+        approxPolyDP epsilon as a fraction of the arc length; the error is the
+        relative change of the dome volume versus the unsimplified polygon.
+        No level reduces a polygon below SIMPLIFY_MIN_VERTICES points.
+        
+        With simplify_max_error the coarsest level within the error bound (and
+        vertex budget) is chosen; with only simplify_max_vertices the finest level
+        within the budget. If the bound cannot be met within the budget, the most
+        accurate level within the budget is used.
+        Without either, polygons over 100 points get the fixed 0.002 level, and the
+        error is only computed with simplify_report_error (0.0 otherwise)
+        """
+        w, h = image_size
+        origin = (w / 2, h / 2)
+        min_points = min(len(polygon), SIMPLIFY_MIN_VERTICES)
+        # Computed on first use: the fixed level needs neither for small polygons
+        arc_length = None
+        full_volume = None
+        
+        def simplify(level: float) -> np.ndarray:
+            nonlocal arc_length
+            if level == 0:
+                return polygon
+            if arc_length is None:
+                arc_length = cv2.arcLength(polygon, True)
+            return cv2.approxPolyDP(polygon, level * arc_length, True).reshape(-1, 2)
+        
+        def volume_error(simplified: np.ndarray) -> float:
+            nonlocal full_volume
+            if simplified is polygon:
+                return 0.0
+            if full_volume is None:
+                full_volume = abs(dome_volume(polygon, origin))
+            if len(simplified) < 3 or full_volume == 0:
+                return 1.0
+            return abs(abs(dome_volume(simplified, origin)) - full_volume) / full_volume
+        
+        def coarsest_within_floor() -> Tuple[np.ndarray, float, float]:
+            for level in reversed(SIMPLIFY_LEVELS):
+                simplified = simplify(level)
+                if len(simplified) >= min_points:
+                    return simplified, level, volume_error(simplified)
+        
+        max_error = self.simplify_max_error
+        max_vertices = self.simplify_max_vertices
+        
+        if max_error is None and max_vertices is None:
+            level = 0.002 if len(polygon) > 100 else 0.0
+            simplified = simplify(level)
+            return simplified, level, volume_error(simplified) if self.simplify_report_error else 0.0
+        
+        if max_error is None:
+            # Vertex count only grows towards finer levels: binary search for the
+            # finest level within the budget
+            best_level, best = None, None
+            lo, hi = 0, len(SIMPLIFY_LEVELS) - 1
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                simplified = simplify(SIMPLIFY_LEVELS[mid])
+                if len(simplified) <= max_vertices:
+                    best_level, best = SIMPLIFY_LEVELS[mid], simplified
+                    hi = mid - 1
+                else:
+                    lo = mid + 1
+            if best is None or len(best) < min_points:
+                return coarsest_within_floor()
+            return best, best_level, volume_error(best)
+        
+        # Coarse to fine: the first level within the error bound has the fewest
+        # vertices; stop once the vertex budget is exceeded
+        candidates = []
+        for level in reversed(SIMPLIFY_LEVELS):
+            simplified = simplify(level)
+            if len(simplified) < min_points:
+                continue
+            if max_vertices is not None and len(simplified) > max_vertices:
+                break
+            error = volume_error(simplified)
+            if error <= max_error:
+                return simplified, level, error
+            candidates.append((simplified, level, error))
+        
+        if candidates:
+            return min(candidates, key=lambda c: c[2])
+        return coarsest_within_floor()
+    
     def create_mesh_from_polygon(self, polygon: np.ndarray, image_size: Tuple[int, int],
-                                height_cm: float, pixels_per_cm: float) -> o3d.geometry.TriangleMesh:
+                                height_cm: float, pixels_per_cm: float) -> FoodMesh:
         """Create 3D mesh from 2D polygon"""
         w, h = image_size
         
-        if len(polygon) > 100:
-            epsilon = 0.002 * cv2.arcLength(polygon, True)
-            polygon = cv2.approxPolyDP(polygon, epsilon, True).squeeze()
-            if len(polygon.shape) == 1:
-                polygon = polygon.reshape(-1, 2)
+        polygon, simplify_level, simplify_error = self.simplify_polygon(polygon, image_size)
         
         vertices_2d = polygon.astype(np.float32)
         vertices_2d[:, 0] = (vertices_2d[:, 0] - w/2) / pixels_per_cm / 100
@@ -168,65 +630,193 @@ class FoodWeightEstimator:
         
         bottom_vertices = np.hstack([vertices_2d, np.zeros((len(vertices_2d), 1))])
         
-        top_vertices = []
-        max_dist = max(np.linalg.norm(v - center_2d) for v in vertices_2d)
-        
-        for v in vertices_2d:
-            dist_from_center = np.linalg.norm(v - center_2d)
-            height_factor = np.exp(-(dist_from_center / max_dist) ** 2)
-            z = height_m * height_factor
-            top_vertices.append([v[0], v[1], z])
-        
-        top_vertices = np.array(top_vertices)
+        # Gaussian dome: height falls off with distance from the centroid
+        dist_from_center = np.linalg.norm(vertices_2d - center_2d, axis=1)
+        max_dist = dist_from_center.max()
+        height_factor = np.exp(-(dist_from_center / max_dist) ** 2)
+        top_vertices = np.column_stack([vertices_2d, height_m * height_factor])
         center_top = np.array([[center_2d[0], center_2d[1], height_m]])
         
         vertices = np.vstack([bottom_vertices, top_vertices, center_top])
         
         n = len(vertices_2d)
         center_idx = 2 * n
+        i = np.arange(n)
+        next_i = (i + 1) % n
         
-        triangles = []
+        sides = np.stack([
+            np.column_stack([i, next_i, i + n]),
+            np.column_stack([next_i, next_i + n, i + n]),
+        ], axis=1).reshape(-1, 3)
         
-        for i in range(n):
-            next_i = (i + 1) % n
-            triangles.append([i, next_i, i + n])
-            triangles.append([next_i, next_i + n, i + n])
+        fan = np.arange(1, n - 1)
+        bottom = np.column_stack([np.zeros_like(fan), fan, fan + 1])
         
-        for i in range(1, n - 1):
-            triangles.append([0, i, i + 1])
+        top = np.column_stack([np.full(n, center_idx), i + n, next_i + n])
         
-        for i in range(n):
-            next_i = (i + 1) % n
-            triangles.append([center_idx, i + n, next_i + n])
+        triangles = np.vstack([sides, bottom, top]).astype(np.int32)
         
-        mesh = o3d.geometry.TriangleMesh()
-        mesh.vertices = o3d.utility.Vector3dVector(vertices)
-        mesh.triangles = o3d.utility.Vector3iVector(np.array(triangles))
-        mesh.compute_vertex_normals()
-        mesh.paint_uniform_color([0.6, 0.4, 0.8])
-        
-        return mesh
+        return FoodMesh(vertices=vertices, triangles=triangles,
+                        simplify_level=simplify_level, simplify_error=simplify_error)
     
-    def calculate_volume(self, mesh: o3d.geometry.TriangleMesh) -> float:
+    def calculate_volume(self, mesh: FoodMesh) -> float:
         """Calculate mesh volume in cm³"""
         vertices = np.asarray(mesh.vertices)
         triangles = np.asarray(mesh.triangles)
         
-        volume = 0.0
-        for tri in triangles:
-            v0, v1, v2 = vertices[tri]
-            volume += np.dot(v0, np.cross(v1, v2)) / 6.0
+        volume = signed_volumes(vertices, triangles)[0]
         
         return abs(volume) * 1_000_000
     
-    def process_image(self, image_path: str, label_path: str, visualize: bool = False) -> List[FoodResult]:
-        """Process single image with label file"""
-        image = cv2.imread(image_path)
+    def calculate_volumes(self, meshes: List[FoodMesh]) -> np.ndarray:
+        """Calculate volumes (cm³) of many meshes in one batched pass"""
+        if not meshes:
+            return np.zeros(0, dtype=np.float64)
+        
+        vertices, triangles, mesh_index = pack_meshes(
+            [(np.asarray(m.vertices), np.asarray(m.triangles)) for m in meshes]
+        )
+        volumes = signed_volumes(vertices, triangles, mesh_index, len(meshes))
+        
+        return np.abs(volumes) * 1_000_000
+    
+    def raster_volume(self, polygon: np.ndarray, height_cm: float, pixels_per_cm: float) -> float:
+        """
+        Volume (cm³) of the Gaussian dome integrated over the pixel centres inside the polygon
+        The dome height is separable, exp(-(dx² + dy²)/r²) = exp(-dx²/r²)·exp(-dy²/r²), so each
+        pixel row inside the polygon contributes its row weight times prefix-sum differences of
+        column weights. Spans are bounded by the edge/row crossings of a vectorized scanline
+        pass, signed by edge direction (winding), so nothing is sorted and the cost grows with
+        the perimeter rather than the area
+        """
+        points = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        center = points.mean(axis=0)
+        max_dist_sq = ((points - center) ** 2).sum(axis=1).max()
+        if max_dist_sq == 0:
+            return 0.0
+        
+        x_start, y_start = np.floor(points.min(axis=0)).astype(np.int64)
+        x_end, y_end = np.ceil(points.max(axis=0)).astype(np.int64)
+        weight_x = np.exp(-(np.arange(x_start, x_end + 1) - center[0]) ** 2 / max_dist_sq)
+        weight_y = np.exp(-(np.arange(y_start, y_end + 1) - center[1]) ** 2 / max_dist_sq)
+        cumulative_x = np.concatenate(([0.0], np.cumsum(weight_x)))
+        
+        # Crossings of every edge with the pixel rows in its half-open y range [y_low, y_high)
+        x0, y0 = points[:, 0], points[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        row_first = np.ceil(np.minimum(y0, y1)).astype(np.int64)
+        row_counts = np.maximum(np.ceil(np.maximum(y0, y1)).astype(np.int64) - row_first, 0)
+        edge = np.repeat(np.arange(len(points)), row_counts)
+        if len(edge) == 0:
+            return 0.0
+        rows = row_first[edge] + np.arange(len(edge)) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+        crossings = x0[edge] + (rows - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+        
+        # A crossing at x contributes ±(weights of columns >= x), the sign given by the edge direction.
+        # Spans are half-open, so edges doubling back over the same pixels cancel exactly
+        direction = np.where(y1[edge] > y0[edge], 1.0, -1.0)
+        columns = np.ceil(crossings).astype(np.int64) - x_start
+        dome_sum = np.dot(direction * weight_y[rows - y_start], cumulative_x[columns])
+        
+        return abs(float(dome_sum)) * height_cm / pixels_per_cm ** 2
+    
+    def estimate_volume(self, polygon: np.ndarray, image_size: Tuple[int, int], height_cm: float,
+                        pixels_per_cm: float, engine: Optional[str] = None,
+                        timer=NULL_TIMER) -> Tuple[float, Optional[FoodMesh]]:
+        """
+        Volume (cm³) with the given engine (default: the estimator's engine)
+        Returns the mesh too for the mesh engine (None for raster)
+        """
+        engine = engine or self.engine
+        if engine == 'raster':
+            with timer.stage('volume'):
+                return self.raster_volume(polygon, height_cm, pixels_per_cm), None
+        if engine != 'mesh':
+            raise ValueError(f"Unknown engine: {engine} (expected one of {ENGINES})")
+        
+        with timer.stage('mesh_build'):
+            mesh = self.create_mesh_from_polygon(polygon, image_size, height_cm, pixels_per_cm)
+        with timer.stage('volume'):
+            return self.calculate_volume(mesh), mesh
+    
+    def load_image(self, image_path: str) -> np.ndarray:
+        """Decode image at the configured decode_scale"""
+        image = cv2.imread(image_path, DECODE_FLAGS[self.decode_scale])
         if image is None:
             raise ValueError(f"Failed to load image: {image_path}")
+        return image
+    
+    def reduce_image(self, image: np.ndarray) -> np.ndarray:
+        """Downscale an already decoded image to the size decode_scale would have decoded"""
+        if self.decode_scale == 1:
+            return image
+        scale = self.decode_scale
+        size = (-(-image.shape[1] // scale), -(-image.shape[0] // scale))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    
+    @staticmethod
+    def settings_key(plate_diameter_cm: float, stats_mode: str, decode_scale: int,
+                     simplify_max_error: Optional[float], simplify_max_vertices: Optional[int],
+                     simplify_report_error: bool, engine: str, *parts: str) -> str:
+        """Key of everything in an estimator that affects results, plus parts (no estimator needed)"""
+        return ResultCache.make_key(
+            ESTIMATOR_VERSION, repr(plate_diameter_cm), stats_mode, str(decode_scale),
+            repr(simplify_max_error), repr(simplify_max_vertices), repr(simplify_report_error), engine,
+            json.dumps(FOOD_DENSITY, sort_keys=True), *parts
+        )
+    
+    def cache_key(self, *parts: str) -> str:
+        """Result cache key: content hashes plus everything in the estimator that affects results"""
+        return self.settings_key(
+            self.plate_diameter_cm, self.stats_mode, self.decode_scale,
+            self.simplify_max_error, self.simplify_max_vertices, self.simplify_report_error, self.engine, *parts
+        )
+    
+    def process_image(self, image_path: str, label_path: str, visualize: bool = False) -> List[FoodResult]:
+        """Process single image with label file"""
+        return [
+            FoodResult(image_path=str(image_path), **row)
+            for row in self.estimate_rows(image_path, label_path, visualize)
+        ]
+    
+    def process_image_to_table(self, image_path: str, label_path: str, table: ResultsTable,
+                               visualize: bool = False) -> int:
+        """Process single image, appending its rows to a columnar table (no FoodResult objects); returns the row count"""
+        rows = self.estimate_rows(image_path, label_path, visualize)
+        image_path = str(image_path)
+        for row in rows:
+            row['image_path'] = image_path
+            table.append(row)
+        return len(rows)
+    
+    def estimate_rows(self, image_path: str, label_path: str, visualize: bool = False) -> List[Dict]:
+        """Per-object result rows of an image: FoodResult fields except image_path"""
+        timer = self.instrumentation.timer('process_image')
         
-        h, w = image.shape[:2]
-        objects = self.parse_yolo_segmentation(label_path, w, h)
+        cache_key = None
+        if self.result_cache is not None and not visualize:
+            with timer.stage('cache_lookup'):
+                cache_key = self.cache_key('image', hash_file(image_path), hash_file(label_path))
+                cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                timer.finish()
+                return cached
+        
+        # Pixels are only needed for food colour statistics, so decode lazily
+        image = None
+        with timer.stage('image_decode'):
+            image_size = read_image_size(image_path)
+            if image_size is None:
+                # Header not readable without decoding: fall back to a full decode
+                full_image = cv2.imread(image_path)
+                if full_image is None:
+                    raise ValueError(f"Failed to load image: {image_path}")
+                image_size = (full_image.shape[1], full_image.shape[0])
+                image = self.reduce_image(full_image)
+        
+        w, h = image_size
+        with timer.stage('label_parse'):
+            objects = self.parse_yolo_segmentation(label_path, w, h)
         
         # Find plate for calibration
         plate_polygon = None
@@ -248,22 +838,28 @@ class FoodWeightEstimator:
         results = []
         meshes = []
         
-        for idx, obj in enumerate(objects):
-            if obj['class_name'] != 'food':
-                continue
-            
+        food_objects = [
+            (idx, obj) for idx, obj in enumerate(objects)
+            if obj['class_name'] == 'food' and len(obj['polygon']) >= 3
+        ]
+        objects_stats = []
+        if food_objects:
+            if image is None:
+                with timer.stage('image_decode'):
+                    image = self.load_image(image_path)
+            with timer.stage('mask_build'):
+                objects_stats = self.compute_image_stats([obj['polygon'] for _, obj in food_objects], image, w, h)
+        
+        for (idx, obj), stats in zip(food_objects, objects_stats):
             polygon = obj['polygon']
-            if len(polygon) < 3:
-                continue
             
-            mask = np.zeros((h, w), dtype=np.uint8)
-            cv2.fillPoly(mask, [polygon], 255)
-            
-            food_type, height_cm = self.detect_food_type(polygon, image, mask, w, h)
+            with timer.stage('classification'):
+                food_type, height_cm = self.detect_food_type(polygon, stats, w, h)
             
             try:
-                mesh = self.create_mesh_from_polygon(polygon, (w, h), height_cm, pixels_per_cm)
-                volume_cm3 = self.calculate_volume(mesh)
+                volume_cm3, mesh = self.estimate_volume(polygon, (w, h), height_cm, pixels_per_cm, timer=timer)
+                if mesh is None and visualize:
+                    mesh = self.create_mesh_from_polygon(polygon, (w, h), height_cm, pixels_per_cm)
                 
                 density = FOOD_DENSITY.get(food_type.lower(), FOOD_DENSITY['default'])
                 weight_g = volume_cm3 * density
@@ -271,20 +867,22 @@ class FoodWeightEstimator:
                 center_x = np.mean(polygon[:, 0]) / w
                 center_y = np.mean(polygon[:, 1]) / h
                 
-                result = FoodResult(
-                    image_path=str(image_path),
-                    object_id=idx,
-                    class_id=obj['class_id'],
-                    food_type=food_type,
-                    volume_cm3=round(volume_cm3, 2),
-                    weight_g=round(weight_g, 2),
-                    weight_kg=round(weight_g / 1000, 4),
-                    density_g_cm3=density,
-                    polygon_points=len(polygon),
-                    area_pixels=int(np.sum(mask > 0)),
-                    center_x=round(center_x, 3),
-                    center_y=round(center_y, 3)
-                )
+                result = {
+                    'object_id': idx,
+                    'class_id': obj['class_id'],
+                    'food_type': food_type,
+                    'volume_cm3': round(volume_cm3, 2),
+                    'weight_g': round(weight_g, 2),
+                    'weight_kg': round(weight_g / 1000, 4),
+                    'density_g_cm3': density,
+                    'polygon_points': len(polygon),
+                    'area_pixels': stats.area_pixels,
+                    'center_x': round(center_x, 3),
+                    'center_y': round(center_y, 3),
+                    'mesh_points': (len(mesh.vertices) - 1) // 2 if mesh is not None else len(polygon),
+                    'simplify_level': mesh.simplify_level if mesh is not None else 0.0,
+                    'simplify_error': round(mesh.simplify_error, 5) if mesh is not None else 0.0
+                }
                 
                 results.append(result)
                 if visualize:
@@ -297,10 +895,20 @@ class FoodWeightEstimator:
             logger.info(f"Opening 3D visualization for {len(meshes)} objects...")
             self._visualize_meshes(meshes)
         
+        if cache_key is not None:
+            self.result_cache.put(cache_key, results)
+        
+        timer.finish()
         return results
     
+    def export_mesh(self, mesh: FoodMesh, output_file: str) -> bool:
+        """Export mesh to a file (format by extension: .ply, .obj, .stl, ...)"""
+        o3d = _open3d()
+        return o3d.io.write_triangle_mesh(str(output_file), mesh.to_open3d())
+    
     def _visualize_meshes(self, meshes: List[Tuple]):
         """Visualize all 3D meshes together"""
+        o3d = _open3d()
         coord_frame = o3d.geometry.TriangleMesh.create_coordinate_frame(
             size=0.05, origin=[0, 0, 0]
         )
@@ -315,13 +923,12 @@ class FoodWeightEstimator:
         geometries = [coord_frame]
         
         for i, (mesh, result) in enumerate(meshes):
-            mesh_copy = o3d.geometry.TriangleMesh(mesh)
-            mesh_copy.paint_uniform_color(colors[i % len(colors)])
+            o3d_mesh = mesh.to_open3d(colors[i % len(colors)])
             offset = np.array([i * 0.15, 0, 0])
-            mesh_copy.translate(offset)
-            geometries.append(mesh_copy)
+            o3d_mesh.translate(offset)
+            geometries.append(o3d_mesh)
         
-        weights = [f"{r.food_type}:{r.weight_g:.0f}g" for _, r in meshes]
+        weights = [f"{r['food_type']}:{r['weight_g']:.0f}g" for _, r in meshes]
         window_name = " | ".join(weights)
         
         logger.info(f"3D window opened. Close window to continue...")
@@ -334,9 +941,169 @@ class FoodWeightEstimator:
         )
 
 
+# Per-process estimator for --workers mode, created once by the pool initializer
+_worker_estimator: Optional[FoodWeightEstimator] = None
+
+
+def _init_worker(estimator_kwargs: Dict):
+    """Pool initializer: keep a warm estimator in each worker process"""
+    global _worker_estimator
+    _worker_estimator = FoodWeightEstimator(**estimator_kwargs)
+
+
+RowRange = Tuple[int, int]
+
+
+def _process_chunk(tasks: List[Tuple[int, str, str]]) -> Tuple[int, List[Tuple[int, Optional[RowRange], Optional[str]]], ResultsTable, Dict, Dict]:
+    """
+    Process a chunk of (index, image, label) tasks in a worker
+    Returns worker pid, (index, row range, error) per task (one bad file never fails
+    the chunk), the chunk's results table, and the worker's stage timing and result
+    cache counters for this chunk
+    """
+    table = new_results_table()
+    outcomes = []
+    for index, img_file, label_file in tasks:
+        start = len(table)
+        try:
+            _worker_estimator.process_image_to_table(img_file, label_file, table)
+            outcomes.append((index, (start, len(table)), None))
+        except Exception as e:
+            table.truncate(start)
+            outcomes.append((index, None, str(e)))
+    
+    timings = _worker_estimator.instrumentation.snapshot()
+    _worker_estimator.instrumentation.reset()
+    cache_counters = _worker_estimator.result_cache.take_counters() if _worker_estimator.result_cache else {}
+    return os.getpid(), outcomes, table, timings, cache_counters
+
+
+def _run_chunks(chunks: List[List[Tuple[int, str, str]]], workers: int, estimator_kwargs: Dict):
+    """
+    Run chunks through _process_chunk in worker processes, yielding (chunk, result, None)
+    as they complete, or (chunk, None, error) when the chunk could not be processed
+    Each worker is its own single-process pool running one chunk at a time, so a worker
+    that dies (e.g. crashed in native code) is known to have died on that chunk: only its
+    pool is replaced, and the chunk is retried one image at a time so the failure is
+    narrowed down to the crashing image while the other workers keep going
+    """
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(estimator_kwargs,))
+    
+    pending = deque(chunks)
+    pools = [new_pool() for _ in range(min(workers, len(chunks)))]
+    running = {}
+    
+    def submit(slot: int):
+        if pending:
+            chunk = pending.popleft()
+            running[pools[slot].submit(_process_chunk, chunk)] = (slot, chunk)
+    
+    try:
+        for slot in range(len(pools)):
+            submit(slot)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                slot, chunk = running.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    pools[slot].shutdown(wait=False)
+                    pools[slot] = new_pool()
+                    if len(chunk) > 1:
+                        logger.warning(f"Worker died on a chunk of {len(chunk)} images, retrying them one by one")
+                        pending.extendleft([task] for task in reversed(chunk))
+                    else:
+                        yield chunk, None, str(e)
+                except Exception as e:
+                    yield chunk, None, str(e)
+                else:
+                    yield chunk, result, None
+                submit(slot)
+    finally:
+        for pool in pools:
+            pool.shutdown()
+
+
+# Streaming mode outputs (relative to output_dir)
+RESULTS_STREAM_FILE = 'results.jsonl'
+MANIFEST_FILE = 'manifest.jsonl'
+# Columnar export of all results (--columnar)
+COLUMNAR_FILE = 'results_table.npz'
+
+
+def _image_record(img_file: Path, objects: List[Dict]) -> Dict:
+    """Per-image output record (same layout for JSON files and JSONL lines)"""
+    return {
+        'image': str(img_file.name),
+        'objects': objects,
+        'total_weight_g': sum(obj['weight_g'] for obj in objects),
+        'total_objects': len(objects)
+    }
+
+
+def _file_fingerprint(path: Path) -> List[int]:
+    """Cheap change detector for resume: [mtime_ns, size]"""
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _load_manifest(manifest_file: Path) -> Dict[str, Dict]:
+    """Load manifest entries keyed by image name (last entry wins)"""
+    manifest = {}
+    if not manifest_file.exists():
+        return manifest
+    
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Partially written line from an interrupted run
+                continue
+            manifest[entry['image']] = entry
+    
+    return manifest
+
+
+def _open_append(path: Path):
+    """Open a line-oriented file for appending, terminating a truncated last line"""
+    if path.exists() and path.stat().st_size > 0:
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+        if needs_newline:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write('\n')
+    return open(path, 'a', encoding='utf-8')
+
+
+def _write_summary(summary_file: Path, summary: Dict, results: Iterable[Tuple[str, List[Dict]]]):
+    """
+    Write summary.json exactly as json.dump(dict(summary, results=dict(results)), indent=2)
+    would, but one image at a time so the per-object dicts never all exist at once
+    """
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        # Reopen the summary object to append the results mapping
+        f.write(json.dumps(summary, indent=2, ensure_ascii=False)[:-2] + ',\n  "results": {')
+        separator = '\n'
+        for name, objects in results:
+            body = json.dumps(objects, indent=2, ensure_ascii=False).replace('\n', '\n    ')
+            f.write(f"{separator}    {json.dumps(name, ensure_ascii=False)}: {body}")
+            separator = ',\n'
+        f.write('}\n}' if separator == '\n' else '\n  }\n}')
+
+
 def process_directory(input_dir: str = './images', labels_dir: str = './labels', 
                      output_dir: str = './results', plate_diameter_cm: float = 24.0,
-                     visualize: bool = False):
+                     visualize: bool = False, stats_mode: str = 'roi',
+                     workers: int = 1, chunk_size: Optional[int] = None,
+                     stream: bool = False, resume: bool = False, label_cache: bool = False,
+                     decode_scale: int = 1, timings: bool = False, track_allocations: bool = False,
+                     cache_dir: Optional[str] = None, cache_max_mb: float = 1024,
+                     simplify_max_error: Optional[float] = None, simplify_max_vertices: Optional[int] = None,
+                     simplify_report_error: bool = False, engine: str = 'mesh', columnar: bool = False):
     """
     Process all images in directory
     
@@ -346,6 +1113,25 @@ def process_directory(input_dir: str = './images', labels_dir: str = './labels',
         output_dir: Directory for JSON results
         plate_diameter_cm: Reference plate diameter
         visualize: Show 3D visualization for each image
+        stats_mode: Per-object pixel statistics mode ('roi' or 'label_map')
+        workers: Number of worker processes (1 = process serially in this process)
+        chunk_size: Images per task sent to a worker (default: derived from image count)
+        stream: Append one JSON line per image to results.jsonl instead of per-image
+            JSON files, keeping only running totals in memory. A reprocessed image
+            gets a new line; the last line for an image supersedes earlier ones
+        resume: Skip images whose image and label files and estimator settings are unchanged
+            since they were recorded in manifest.jsonl by a previous run (implies stream)
+        label_cache: Cache parsed labels as .npz files next to the label files
+        decode_scale: Decode images at 1/decode_scale resolution (1, 2, 4 or 8)
+        timings: Record per-stage timings and save aggregated counters to timings.json
+        track_allocations: With timings, also record peak allocation per stage (tracemalloc, slow)
+        cache_dir: Directory of the content-addressed result cache (disabled if None)
+        cache_max_mb: Result cache size bound; least recently used entries are evicted
+        simplify_max_error: Adaptive polygon simplification: max relative volume error
+        simplify_max_vertices: Adaptive polygon simplification: max polygon vertices per mesh
+        simplify_report_error: Compute simplify_error for the fixed simplification level too
+        engine: Volume engine ('mesh' or 'raster')
+        columnar: Also save all results as a columnar table (results_table.npz)
     """
     input_path = Path(input_dir)
     labels_path = Path(labels_dir)
@@ -370,54 +1156,208 @@ def process_directory(input_dir: str = './images', labels_dir: str = './labels',
     
     logger.info(f"Found {len(image_files)} images")
     
-    estimator = FoodWeightEstimator(plate_diameter_cm=plate_diameter_cm)
-    all_results = {}
+    if resume:
+        stream = True
+    
+    estimator_kwargs = {
+        'plate_diameter_cm': plate_diameter_cm,
+        'stats_mode': stats_mode,
+        'label_cache': label_cache,
+        'decode_scale': decode_scale,
+        'instrument': timings,
+        'track_allocations': track_allocations,
+        'cache_dir': cache_dir,
+        'cache_max_mb': cache_max_mb,
+        'simplify_max_error': simplify_max_error,
+        'simplify_max_vertices': simplify_max_vertices,
+        'simplify_report_error': simplify_report_error,
+        'engine': engine,
+    }
+    
+    manifest = _load_manifest(output_path / MANIFEST_FILE) if resume else {}
+    # Results of a previous run are only reused if they were produced with the same settings
+    settings = FoodWeightEstimator.settings_key(
+        plate_diameter_cm, stats_mode, decode_scale, simplify_max_error, simplify_max_vertices,
+        simplify_report_error, engine, 'resume'
+    ) if stream else None
+    totals = {'total_images': 0, 'total_objects': 0, 'total_weight_g': 0.0}
     
-    for img_file in image_files:
+    tasks = []
+    fingerprints = {}
+    skipped = 0
+    for index, img_file in enumerate(image_files):
         label_file = labels_path / f"{img_file.stem}.txt"
         
         if not label_file.exists():
             logger.warning(f"No label file for {img_file.name}")
             continue
         
-        try:
-            results = estimator.process_image(str(img_file), str(label_file), visualize=visualize)
-            
-            if results:
-                all_results[img_file.name] = [asdict(r) for r in results]
-                
-                # Save individual JSON
+        if stream:
+            fingerprint = (_file_fingerprint(img_file), _file_fingerprint(label_file))
+            entry = manifest.get(img_file.name)
+            if entry and (entry['image_fp'], entry['label_fp']) == fingerprint and entry.get('settings') == settings:
+                if entry['objects']:
+                    totals['total_images'] += 1
+                    totals['total_objects'] += entry['objects']
+                    totals['total_weight_g'] += entry['weight_g']
+                skipped += 1
+                continue
+            fingerprints[index] = fingerprint
+        
+        tasks.append((index, str(img_file), str(label_file)))
+    
+    if resume:
+        logger.info(f"Resuming: {skipped} unchanged images skipped, {len(tasks)} to process")
+    
+    if visualize and workers > 1:
+        logger.warning("Visualization requires serial processing, ignoring --workers")
+        workers = 1
+    
+    # Results are kept as rows of a columnar table; non-streaming row ranges are keyed
+    # by input order so the summary matches a serial run. Streaming runs only keep rows
+    # for the columnar export
+    table = new_results_table()
+    rows_by_index: Dict[int, RowRange] = {}
+    keep_rows = columnar or not stream
+    failures = defaultdict(list)
+    instrumentation = Instrumentation(enabled=timings)
+    cache_counters = defaultdict(int)
+    stream_file = _open_append(output_path / RESULTS_STREAM_FILE) if stream else None
+    manifest_file = _open_append(output_path / MANIFEST_FILE) if stream else None
+    
+    def handle(index: int, rows: Optional[RowRange], error: Optional[str], worker: str):
+        img_file = image_files[index]
+        if error is not None:
+            logger.error(f"Failed {img_file.name}: {error}")
+            failures[worker].append({'image': img_file.name, 'error': error})
+            return
+        
+        record = _image_record(img_file, table.rows(*rows))
+        
+        if record['objects']:
+            if stream:
+                stream_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                stream_file.flush()
+                totals['total_images'] += 1
+                totals['total_objects'] += record['total_objects']
+                totals['total_weight_g'] += record['total_weight_g']
+            else:
                 output_file = output_path / f"{img_file.stem}.json"
                 with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump({
-                        'image': str(img_file.name),
-                        'objects': [asdict(r) for r in results],
-                        'total_weight_g': sum(r.weight_g for r in results),
-                        'total_objects': len(results)
-                    }, f, indent=2, ensure_ascii=False)
-                
-                logger.info(f"Processed {img_file.name}: {len(results)} objects, "
-                          f"total weight: {sum(r.weight_g for r in results):.1f}g")
+                    json.dump(record, f, indent=2, ensure_ascii=False)
+                rows_by_index[index] = rows
             
-        except Exception as e:
-            logger.error(f"Failed {img_file.name}: {e}")
+            logger.info(f"Processed {img_file.name}: {record['total_objects']} objects, "
+                      f"total weight: {record['total_weight_g']:.1f}g")
+        
+        if stream:
+            image_fp, label_fp = fingerprints[index]
+            manifest_file.write(json.dumps({
+                'image': img_file.name,
+                'image_fp': image_fp,
+                'label_fp': label_fp,
+                'settings': settings,
+                'objects': record['total_objects'],
+                'weight_g': record['total_weight_g']
+            }) + '\n')
+            manifest_file.flush()
+    
+    try:
+        if workers <= 1:
+            estimator = FoodWeightEstimator(**estimator_kwargs)
+            for index, img_file, label_file in tasks:
+                start = len(table)
+                try:
+                    estimator.process_image_to_table(img_file, label_file, table, visualize=visualize)
+                except Exception as e:
+                    table.truncate(start)
+                    handle(index, None, str(e), 'main')
+                    continue
+                handle(index, (start, len(table)), None, 'main')
+                if not keep_rows:
+                    table.truncate()
+            instrumentation.merge(estimator.instrumentation.snapshot())
+            if estimator.result_cache is not None:
+                cache_counters.update(estimator.result_cache.take_counters())
+        else:
+            if chunk_size is None:
+                chunk_size = max(1, min(64, len(tasks) // (workers * 4)))
+            chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+            logger.info(f"Processing with {workers} workers, {len(chunks)} chunks of up to {chunk_size} images")
+            
+            for chunk, result, failure in _run_chunks(chunks, workers, estimator_kwargs):
+                if failure is not None:
+                    for index, _, _ in chunk:
+                        handle(index, None, f"worker failure: {failure}", 'unknown')
+                    continue
+                
+                pid, outcomes, chunk_table, worker_timings, worker_cache = result
+                offset = table.append_table(chunk_table)
+                for index, rows, error in outcomes:
+                    if rows is not None:
+                        rows = (rows[0] + offset, rows[1] + offset)
+                    handle(index, rows, error, f"pid-{pid}")
+                if not keep_rows:
+                    table.truncate()
+                instrumentation.merge(worker_timings)
+                for name, value in worker_cache.items():
+                    cache_counters[name] += value
+    finally:
+        if stream:
+            stream_file.close()
+            manifest_file.close()
     
     # Save summary
     summary_file = output_path / 'summary.json'
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'total_images': len(all_results),
-            'total_objects': sum(len(objs) for objs in all_results.values()),
-            'total_weight_g': sum(
-                sum(obj['weight_g'] for obj in objs) 
-                for objs in all_results.values()
-            ),
-            'results': all_results
-        }, f, indent=2, ensure_ascii=False)
+    if stream:
+        summary = dict(totals, results_file=RESULTS_STREAM_FILE)
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    else:
+        ordered = [rows_by_index[index] for index in sorted(rows_by_index)]
+        weights = table.column('weight_g')
+        summary = {
+            'total_images': len(ordered),
+            'total_objects': sum(stop - start for start, stop in ordered),
+            'total_weight_g': sum(sum(weights[start:stop].tolist()) for start, stop in ordered),
+        }
+        _write_summary(summary_file, summary, (
+            (image_files[index].name, table.rows(*rows_by_index[index]))
+            for index in sorted(rows_by_index)
+        ))
+    
+    if columnar:
+        table.save(output_path / COLUMNAR_FILE)
+        logger.info(f"Columnar results: {len(table)} rows, {table.nbytes / 1024:.0f} KiB in memory")
+    
+    if timings:
+        timings_file = output_path / 'timings.json'
+        with open(timings_file, 'w', encoding='utf-8') as f:
+            json.dump(instrumentation.snapshot(), f, indent=2)
+        
+        for call, counters in instrumentation.snapshot().items():
+            breakdown = ", ".join(
+                f"{name} {stage['total_s']:.2f}s" for name, stage in counters['stages'].items()
+            )
+            logger.info(f"Timings {call} x{counters['count']}: {counters['total_s']:.2f}s ({breakdown})")
+    
+    if cache_dir:
+        ratio = hit_ratio(cache_counters)
+        logger.info(f"Result cache: {cache_counters['hits']} hits, {cache_counters['misses']} misses, "
+                  f"{cache_counters['evictions']} evictions"
+                  + (f", hit ratio {ratio:.1%}" if ratio is not None else ""))
+    
+    if failures:
+        failures_file = output_path / 'failures.json'
+        with open(failures_file, 'w', encoding='utf-8') as f:
+            json.dump(failures, f, indent=2, ensure_ascii=False)
+        
+        for worker, items in failures.items():
+            logger.warning(f"Worker {worker}: {len(items)} failed images")
+        logger.warning(f"Failure report saved to {failures_file}")
     
     logger.info(f"Results saved to {output_path}")
-    logger.info(f"Summary: {len(all_results)} images, "
-              f"{sum(len(objs) for objs in all_results.values())} objects")
+    logger.info(f"Summary: {summary['total_images']} images, {summary['total_objects']} objects")
 
 
 if __name__ == '__main__':
@@ -431,6 +1371,38 @@ if __name__ == '__main__':
                        help='Plate diameter in cm')
     parser.add_argument('--visualize', '-v', action='store_true',
                        help='Show 3D visualization for each image')
+    parser.add_argument('--stats-mode', choices=STATS_MODES, default='roi',
+                       help='Per-object pixel statistics: per-object ROI masks or one shared label map')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                       help='Number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                       help='Images per task sent to a worker')
+    parser.add_argument('--stream', action='store_true',
+                       help='Append one JSON line per image to results.jsonl instead of per-image files')
+    parser.add_argument('--resume', action='store_true',
+                       help='Skip images unchanged since the last streaming run (implies --stream)')
+    parser.add_argument('--label-cache', action='store_true',
+                       help='Cache parsed labels as .npz files next to the label files')
+    parser.add_argument('--decode-scale', type=int, choices=sorted(DECODE_FLAGS), default=1,
+                       help='Decode images at reduced resolution (1/2, 1/4, 1/8) for colour statistics')
+    parser.add_argument('--timings', action='store_true',
+                       help='Record per-stage timings and save them to timings.json')
+    parser.add_argument('--track-allocations', action='store_true',
+                       help='With --timings, also record peak allocation per stage (slow)')
+    parser.add_argument('--cache-dir', default=None,
+                       help='Content-addressed result cache directory (reused across runs)')
+    parser.add_argument('--cache-max-mb', type=float, default=1024,
+                       help='Result cache size limit in MB (LRU eviction)')
+    parser.add_argument('--simplify-max-error', type=float, default=None,
+                       help='Adaptive polygon simplification: max relative volume error (e.g. 0.01)')
+    parser.add_argument('--simplify-max-vertices', type=int, default=None,
+                       help='Adaptive polygon simplification: max polygon vertices per mesh')
+    parser.add_argument('--simplify-report-error', action='store_true',
+                       help='Also compute simplify_error for the fixed simplification level')
+    parser.add_argument('--engine', choices=ENGINES, default='mesh',
+                       help='Volume engine: triangle mesh or direct integration over the pixel grid')
+    parser.add_argument('--columnar', action='store_true',
+                       help=f'Also save all results as a columnar table ({COLUMNAR_FILE})')
     
     args = parser.parse_args()
     
@@ -439,5 +1411,21 @@ if __name__ == '__main__':
         labels_dir=args.labels,
         output_dir=args.output,
         plate_diameter_cm=args.plate_diameter,
-        visualize=args.visualize
+        visualize=args.visualize,
+        stats_mode=args.stats_mode,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        stream=args.stream,
+        resume=args.resume,
+        label_cache=args.label_cache,
+        decode_scale=args.decode_scale,
+        timings=args.timings,
+        track_allocations=args.track_allocations,
+        cache_dir=args.cache_dir,
+        cache_max_mb=args.cache_max_mb,
+        simplify_max_error=args.simplify_max_error,
+        simplify_max_vertices=args.simplify_max_vertices,
+        simplify_report_error=args.simplify_report_error,
+        engine=args.engine,
+        columnar=args.columnar
     )
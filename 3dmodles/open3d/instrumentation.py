@@ -0,0 +1,145 @@
+"""
+Per-stage instrumentation for the weight estimation pipeline
+Records wall time (and optionally peak allocation) of each stage of a call,
+keeps recent per-call records and aggregated counters.
+Disabled instrumentation hands out a shared no-op timer, so it can stay wired in
+"""
+
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+_NULL_STAGE = nullcontext()
+
+
+class _NullTimer:
+    """Timer handed out when instrumentation is disabled"""
+    __slots__ = ()
+
+    def stage(self, name: str):
+        return _NULL_STAGE
+
+    def finish(self) -> Optional[Dict]:
+        return None
+
+
+NULL_TIMER = _NullTimer()
+
+
+class CallTimer:
+    """Collects stage timings of a single call"""
+
+    def __init__(self, owner: 'Instrumentation', call: str):
+        self._owner = owner
+        self.call = call
+        self.stages: Dict[str, float] = {}
+        self.allocations: Dict[str, int] = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage; repeated stages (e.g. per object) accumulate"""
+        track = self._owner.track_allocations and tracemalloc.is_tracing()
+        if track:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+            if track:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                self.allocations[name] = max(self.allocations.get(name, 0), peak)
+
+    def finish(self) -> Dict:
+        """Close the call, add it to the aggregated counters and return its record"""
+        record = {
+            'call': self.call,
+            'total_s': time.perf_counter() - self._start,
+            'stages': self.stages,
+        }
+        if self.allocations:
+            record['alloc_peak_bytes'] = self.allocations
+
+        self._owner.add_record(record)
+        return record
+
+
+class Instrumentation:
+    """Per-call stage records and aggregated counters"""
+
+    def __init__(self, enabled: bool = False, track_allocations: bool = False, history: int = 100):
+        self.enabled = enabled
+        self.track_allocations = track_allocations
+        self.records = deque(maxlen=history)
+        self._counters: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        if enabled and track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def timer(self, call: str):
+        """Timer for one call (a shared no-op timer when disabled)"""
+        if not self.enabled:
+            return NULL_TIMER
+        return CallTimer(self, call)
+
+    @property
+    def last_record(self) -> Optional[Dict]:
+        return self.records[-1] if self.records else None
+
+    def add_record(self, record: Dict):
+        """Store a per-call record and fold it into the counters"""
+        with self._lock:
+            self.records.append(record)
+            self._merge_call(record['call'], 1, record['total_s'], {
+                name: {
+                    'count': 1,
+                    'total_s': seconds,
+                    'max_s': seconds,
+                    'alloc_peak_bytes': record.get('alloc_peak_bytes', {}).get(name, 0),
+                }
+                for name, seconds in record['stages'].items()
+            })
+
+    def merge(self, snapshot: Dict):
+        """Fold counters from another snapshot (e.g. a worker process) into this one"""
+        with self._lock:
+            for call, counters in snapshot.items():
+                self._merge_call(call, counters['count'], counters['total_s'], counters['stages'])
+
+    def _merge_call(self, call: str, count: int, total_s: float, stages: Dict[str, Dict]):
+        counters = self._counters.setdefault(call, {'count': 0, 'total_s': 0.0, 'stages': {}})
+        counters['count'] += count
+        counters['total_s'] += total_s
+
+        for name, stage in stages.items():
+            current = counters['stages'].setdefault(
+                name, {'count': 0, 'total_s': 0.0, 'max_s': 0.0, 'alloc_peak_bytes': 0}
+            )
+            current['count'] += stage['count']
+            current['total_s'] += stage['total_s']
+            current['max_s'] = max(current['max_s'], stage['max_s'])
+            current['alloc_peak_bytes'] = max(current['alloc_peak_bytes'], stage['alloc_peak_bytes'])
+
+    def snapshot(self) -> Dict:
+        """Aggregated counters: {call: {count, total_s, stages: {stage: {count, total_s, max_s, alloc_peak_bytes}}}}"""
+        with self._lock:
+            return {
+                call: {
+                    'count': counters['count'],
+                    'total_s': counters['total_s'],
+                    'stages': {name: dict(stage) for name, stage in counters['stages'].items()},
+                }
+                for call, counters in self._counters.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self.records.clear()
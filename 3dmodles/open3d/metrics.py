@@ -0,0 +1,138 @@
+"""
+Prometheus metrics for the modeling server
+Request latency histograms, in-flight and status counts come from an ASGI middleware;
+pool, cache and stage counters the server already keeps are read at scrape time by a
+collector rather than counted twice.
+With several server workers set PROMETHEUS_MULTIPROC_DIR (an empty directory shared
+by the workers) to aggregate request metrics across them
+"""
+
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUESTS = Counter('modeling_http_requests_total', 'HTTP requests by route and status code',
+                   ['method', 'route', 'status'])
+REQUEST_LATENCY = Histogram('modeling_http_request_duration_seconds', 'HTTP request latency until the response is sent',
+                            ['method', 'route'], buckets=LATENCY_BUCKETS)
+IN_PROGRESS = Gauge('modeling_http_requests_in_progress', 'HTTP requests being served',
+                    ['method', 'route'], multiprocess_mode='livesum')
+POOL_CALL_LATENCY = Histogram('modeling_pool_call_duration_seconds',
+                              'ModelingLogic calls in the pool, including time queued', ['method'],
+                              buckets=LATENCY_BUCKETS)
+
+
+def route_name(scope: Dict) -> str:
+    """Path template of the route serving a request (bounded label values)"""
+    app = scope.get('app')
+    for route in getattr(getattr(app, 'router', None), 'routes', ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request until its last response byte"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        route = route_name(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        in_progress = IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, route, str(status)).inc()
+            in_progress.dec()
+
+
+class StatsCollector:
+    """
+    Scrape-time view of the server's own counters: pool_stats() as ModelingPool.stats,
+    cache_stats() as {cache name: ResultCache/MemoryCache stats or None},
+    stage_snapshot() as Instrumentation.snapshot
+    """
+
+    def __init__(self, pool_stats: Callable[[], Dict], cache_stats: Callable[[], Dict[str, Optional[Dict]]],
+                 stage_snapshot: Callable[[], Dict]):
+        self.pool_stats = pool_stats
+        self.cache_stats = cache_stats
+        self.stage_snapshot = stage_snapshot
+
+    def collect(self):
+        pool = self.pool_stats()
+        for name in ('workers', 'max_pending', 'running', 'queue_depth'):
+            yield GaugeMetricFamily(f'modeling_pool_{name}', f'Modeling pool {name}', value=pool[name])
+        for name in ('completed', 'rejected'):
+            yield CounterMetricFamily(f'modeling_pool_{name}', f'Modeling pool calls {name}', value=pool[name])
+        yield CounterMetricFamily('modeling_pool_restarts', 'Modeling pools replaced after a worker died',
+                                  value=pool['restarts'])
+
+        lookups = CounterMetricFamily('modeling_cache_lookups', 'Result cache lookups', labels=['cache', 'result'])
+        evictions = CounterMetricFamily('modeling_cache_evictions', 'Result cache evictions', labels=['cache'])
+        ratio = GaugeMetricFamily('modeling_cache_hit_ratio', 'Result cache hit ratio since start', labels=['cache'])
+        for cache, stats in self.cache_stats().items():
+            if stats is None:
+                continue
+            lookups.add_metric([cache, 'hit'], stats['hits'])
+            lookups.add_metric([cache, 'miss'], stats['misses'])
+            evictions.add_metric([cache], stats['evictions'])
+            if stats['hit_ratio'] is not None:
+                ratio.add_metric([cache], stats['hit_ratio'])
+        yield lookups
+        yield evictions
+        yield ratio
+
+        stage_seconds = CounterMetricFamily('modeling_stage_seconds', 'Time spent per pipeline stage',
+                                            labels=['call', 'stage'])
+        stage_count = CounterMetricFamily('modeling_stage_runs', 'Pipeline stage runs', labels=['call', 'stage'])
+        for call, counters in self.stage_snapshot().items():
+            for stage, stats in counters['stages'].items():
+                stage_seconds.add_metric([call, stage], stats['total_s'])
+                stage_count.add_metric([call, stage], stats['count'])
+        yield stage_seconds
+        yield stage_count
+
+
+_registry: Optional[CollectorRegistry] = None
+
+
+def register(collector: StatsCollector):
+    """Register the server's collector, with multiprocess aggregation when PROMETHEUS_MULTIPROC_DIR is set"""
+    global _registry
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        _registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(_registry)
+    else:
+        _registry = REGISTRY
+    _registry.register(collector)
+
+
+def exposition() -> tuple:
+    """(body, content type) of the /metrics response"""
+    return generate_latest(_registry or REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,224 @@
+"""
+Content-addressed result caches
+ResultCache: entries are JSON files named by a hash of everything that determines
+the result. Recency is tracked through file mtimes, so one cache directory can be
+shared by several processes (process_directory workers, modeling server instances).
+MemoryCache: in-process LRU with a time to live, for serving repeated requests
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Union
+
+COUNTERS = ('hits', 'misses', 'writes', 'evictions')
+MEMORY_COUNTERS = COUNTERS + ('expirations', 'invalidations')
+
+
+def hash_file(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """JSON result cache with LRU eviction bounded by total size on disk"""
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 1 << 30):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.counters = {name: 0 for name in COUNTERS}
+        self._lock = threading.Lock()
+        self._size = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def make_key(*parts: Union[str, bytes]) -> str:
+        """Hash key parts (length-prefixed so part boundaries are unambiguous)"""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode('utf-8')
+            digest.update(len(part).to_bytes(8, 'little'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+
+        # Touch for LRU recency
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self._count('hits')
+        return value
+
+    def put(self, key: str, value: Any):
+        """Store a JSON-serializable value (atomic replace), evicting if over budget"""
+        path = self._path(key)
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        try:
+            path.parent.mkdir(exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        self._count('writes')
+        with self._lock:
+            self._size += len(data)
+            over_budget = self._size > self.max_bytes
+
+        if over_budget:
+            self.evict()
+
+    def _entries(self):
+        for subdir in self.directory.iterdir():
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir):
+                if entry.name.endswith('.json'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield stat.st_mtime_ns, stat.st_size, entry.path
+
+    def evict(self, target_ratio: float = 0.9):
+        """Delete least recently used entries until the cache is under target_ratio * max_bytes"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * target_ratio)
+        evicted = 0
+
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._size = total
+            self.counters['evictions'] += evicted
+
+    def take_counters(self) -> Dict[str, int]:
+        """Return counters and reset them (used to ship deltas from worker processes)"""
+        with self._lock:
+            counters = dict(self.counters)
+            self.counters = {name: 0 for name in COUNTERS}
+        return counters
+
+    def merge_counters(self, counters: Dict[str, int]):
+        """Add counter deltas taken from another process's cache instance"""
+        with self._lock:
+            for name, value in counters.items():
+                self.counters[name] += value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            size = self._size
+        return dict(counters, hit_ratio=hit_ratio(counters), size_bytes=size, max_bytes=self.max_bytes)
+
+
+class MemoryCache:
+    """
+    In-process LRU cache bounded by entry count, entries expire after ttl_s.
+    A generation (e.g. a hash of everything results depend on) can be attached:
+    setting a different one drops every entry
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.generation: Optional[Hashable] = None
+        self.counters = {name: 0 for name in MEMORY_COUNTERS}
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for key, or None (missing or expired)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any):
+        """Store a value, evicting the least recently used entries over max_entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            self.counters['writes'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def set_generation(self, generation: Hashable) -> bool:
+        """Attach a generation; returns True (and drops every entry) if it changed"""
+        with self._lock:
+            if generation == self.generation:
+                return False
+            changed = self.generation is not None
+            self.generation = generation
+        if changed:
+            self.clear()
+        return changed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.counters['invalidations'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._entries)
+        return dict(counters, hit_ratio=hit_ratio(counters), entries=entries,
+                    max_entries=self.max_entries, ttl_s=self.ttl_s)
+
+
+def hit_ratio(counters: Dict[str, int]) -> Optional[float]:
+    lookups = counters['hits'] + counters['misses']
+    return counters['hits'] / lookups if lookups else None
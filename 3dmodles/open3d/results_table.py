@@ -0,0 +1,145 @@
+"""
+Columnar (struct-of-arrays) result table
+Rows are stored as typed numpy columns instead of one Python object per result;
+string columns are dictionary-encoded (int32 codes + a list of distinct values).
+Tables can be merged (e.g. chunks from worker processes), viewed as JSON-ready
+row dicts and saved to / loaded from a columnar .npz file
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+# Suffixes of the arrays holding a dictionary column's values in a saved table
+DICTIONARY_DATA = '__dictionary'
+DICTIONARY_OFFSETS = '__offsets'
+
+
+class ResultsTable:
+    """Growable table with a fixed schema {column: numpy dtype, or str for dictionary-encoded strings}"""
+
+    def __init__(self, schema: Dict[str, type], capacity: int = 1024):
+        self.schema = dict(schema)
+        self._length = 0
+        self._capacity = max(1, capacity)
+        self._data = {
+            name: np.zeros(self._capacity, dtype=np.int32 if kind is str else kind)
+            for name, kind in self.schema.items()
+        }
+        # Dictionary columns: distinct values and value -> code
+        self._values: Dict[str, List[str]] = {name: [] for name, kind in self.schema.items() if kind is str}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in self._values}
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the column buffers (including spare capacity)"""
+        return sum(data.nbytes for data in self._data.values())
+
+    def _reserve(self, length: int):
+        if length <= self._capacity:
+            return
+        capacity = max(length, self._capacity * 2)
+        for name, data in self._data.items():
+            grown = np.zeros(capacity, dtype=data.dtype)
+            grown[:self._length] = data[:self._length]
+            self._data[name] = grown
+        self._capacity = capacity
+
+    def _encode(self, name: str, value: str) -> int:
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._values[name])
+            self._values[name].append(value)
+        return code
+
+    def append(self, row: Dict):
+        """Append one row given as {column: value}"""
+        self._reserve(self._length + 1)
+        index = self._length
+        for name, data in self._data.items():
+            value = row[name]
+            data[index] = self._encode(name, value) if name in self._codes else value
+        self._length += 1
+
+    def extend(self, rows: Iterable[Dict]):
+        for row in rows:
+            self.append(row)
+
+    def append_table(self, other: 'ResultsTable') -> int:
+        """Append all rows of a table with the same schema, returns the offset of the first appended row"""
+        if other.schema != self.schema:
+            raise ValueError("Cannot append a table with a different schema")
+
+        offset = self._length
+        count = len(other)
+        self._reserve(offset + count)
+        for name, data in self._data.items():
+            values = other._data[name][:count]
+            if name in self._codes:
+                remap = np.array([self._encode(name, value) for value in other._values[name]], dtype=np.int32)
+                values = remap[values] if len(remap) else values
+            data[offset:offset + count] = values
+        self._length += count
+        return offset
+
+    def truncate(self, length: int = 0):
+        """Drop rows from length on (dictionaries are kept)"""
+        self._length = min(self._length, length)
+
+    def column(self, name: str) -> np.ndarray:
+        """Column values as a view (codes for dictionary columns)"""
+        return self._data[name][:self._length]
+
+    def dictionary(self, name: str) -> List[str]:
+        """Distinct values of a dictionary column, indexed by code"""
+        return self._values[name]
+
+    def decode(self, name: str, start: int = 0, stop: Optional[int] = None) -> List:
+        """Column values as Python objects (dictionary columns decoded)"""
+        stop = self._length if stop is None else min(stop, self._length)
+        values = self._data[name][start:stop].tolist()
+        if name in self._values:
+            lookup = self._values[name]
+            return [lookup[code] for code in values]
+        return values
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """JSON view: rows [start, stop) as dicts of Python values in schema order"""
+        columns = [self.decode(name, start, stop) for name in self.schema]
+        return [dict(zip(self.schema, values)) for values in zip(*columns)]
+
+    def save(self, path: Union[str, Path]):
+        """
+        Write the columns to an uncompressed .npz file (column buffers are written as is)
+        Dictionary columns store int32 codes plus their values as UTF-8 data and offsets
+        """
+        arrays = {name: self.column(name) for name in self.schema}
+        for name, values in self._values.items():
+            encoded = [value.encode('utf-8') for value in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            arrays[name + DICTIONARY_DATA] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            arrays[name + DICTIONARY_OFFSETS] = offsets
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], schema: Dict[str, type]) -> 'ResultsTable':
+        """Read a table written by save"""
+        with np.load(path) as arrays:
+            length = len(arrays[next(iter(schema))]) if schema else 0
+            table = cls(schema, capacity=length)
+            for name, kind in schema.items():
+                table._data[name][:length] = arrays[name]
+                if kind is str:
+                    data = arrays[name + DICTIONARY_DATA].tobytes()
+                    offsets = arrays[name + DICTIONARY_OFFSETS]
+                    values = [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+                    table._values[name] = values
+                    table._codes[name] = {value: code for code, value in enumerate(values)}
+            table._length = length
+        return table
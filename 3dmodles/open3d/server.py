@@ -1,25 +1,38 @@
-from fastapi import FastAPI, Request
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, List, Dict, Any, Optional
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+import asyncio
 import uvicorn
+import hashlib
+import tempfile
+import json
 import os
 import sys
+import time
 
 # Add current directory to path so we can import food_weight
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import the estimator logic from the existing script
 # We will need to adapt food_weight.py slightly or use it as library
+# Open3D is not imported here: food_weight loads it lazily, only for visualization/export
 try:
-    from food_weight import FoodWeightEstimator, FOOD_DENSITY
+    from food_weight import ENGINES, ESTIMATOR_VERSION, FoodWeightEstimator, FOOD_DENSITY
+    from instrumentation import NULL_TIMER
+    from result_cache import MemoryCache, ResultCache
     import numpy as np
-    import cv2
-    import open3d as o3d
+    import metrics
+    import wire_format
 except ImportError:
     # If imports fail (e.g. missing dependencies in this environment), we can mock or fail
     print("Warning: Could not import food_weight dependencies")
 
 app = FastAPI(title="Auto Modeling Service (3D Models)")
+app.add_middleware(metrics.MetricsMiddleware)
 
 class SegmentationItem(BaseModel):
     class_name: str
@@ -31,68 +44,611 @@ class SegmentationRequest(BaseModel):
     height: int
     segments: List[SegmentationItem]
 
+class BatchSegmentationRequest(BaseModel):
+    # Items are validated one by one (validate_segmentation), so a malformed one only fails itself
+    items: List[Any]
+
+async def read_segmentation(request: Request):
+    """
+    /model body by content type: the compact binary format (wire_format.CONTENT_TYPE,
+    decoded into numpy views) or SegmentationRequest JSON
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type == wire_format.CONTENT_TYPE:
+        try:
+            return wire_format.decode_segmentation(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid binary segmentation: {e}")
+    
+    try:
+        return parse_segmentation_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+def validate_segmentation(value: Any) -> SegmentationRequest:
+    """SegmentationRequest from an already decoded JSON value, raises ValidationError"""
+    if hasattr(SegmentationRequest, "model_validate"):
+        return SegmentationRequest.model_validate(value)
+    return SegmentationRequest.parse_obj(value)  # pydantic 1
+
+def parse_segmentation_json(body: bytes) -> SegmentationRequest:
+    """SegmentationRequest from JSON, raises ValidationError"""
+    if hasattr(SegmentationRequest, "model_validate_json"):
+        return SegmentationRequest.model_validate_json(body)
+    return SegmentationRequest.parse_raw(body)  # pydantic 1
+
+async def spool_body(request: Request, max_memory: int):
+    """Request body copied, as it arrives, into a temporary file kept in memory up to max_memory bytes"""
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+# Height estimation (simplified): every food is modeled as a dome of this height
+FOOD_HEIGHT_CM = 3.0
+
+def canonical_segmentation_hash(data: SegmentationRequest) -> str:
+    """
+    Hash of the parts of a request that affect modeling: size, classes and
+    polygons quantized to the integer pixel grid used by the estimator
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{data.width}x{data.height}:{len(data.segments)}".encode())
+    for seg in data.segments:
+        poly = np.array(seg.polygon, dtype=np.int32).reshape(-1, 2)
+        digest.update(f"|{seg.class_name}:{len(poly)}|".encode())
+        digest.update(poly.tobytes())
+    return digest.hexdigest()
+
+def warmup_segmentation(width: int = 1280, height: int = 960, points: int = 400) -> SegmentationRequest:
+    """Synthetic request shaped like a real one: a round plate with two dense food masks"""
+    angles = np.linspace(0, 2 * np.pi, points, endpoint=False)
+    
+    def ellipse(cx: float, cy: float, rx: float, ry: float) -> List[List[float]]:
+        return np.column_stack([cx + rx * np.cos(angles), cy + ry * np.sin(angles)]).round(1).tolist()
+    
+    return SegmentationRequest(width=width, height=height, segments=[
+        SegmentationItem(class_name='plate', polygon=ellipse(width / 2, height / 2, height * 0.45, height * 0.45)),
+        SegmentationItem(class_name='rice', polygon=ellipse(width * 0.42, height / 2, height * 0.15, height * 0.2)),
+        SegmentationItem(class_name='chicken', polygon=ellipse(width * 0.6, height / 2, height * 0.12, height * 0.1)),
+    ])
+
 class ModelingLogic:
-    def __init__(self):
-        self.estimator = FoodWeightEstimator(plate_diameter_cm=24.0)
+    def __init__(self, instrument: bool = False, track_allocations: bool = False,
+                 cache_dir: Optional[str] = None, cache_max_mb: float = 1024, engine: str = 'mesh'):
+        self.estimator = FoodWeightEstimator(plate_diameter_cm=24.0, instrument=instrument,
+                                             track_allocations=track_allocations,
+                                             cache_dir=cache_dir, cache_max_mb=cache_max_mb,
+                                             engine=engine)
 
-    def process(self, data: SegmentationRequest):
-        w = data.width
-        h = data.height
-        
-        # Try to find plate to calibrate
-        pixels_per_cm = None
+    def calibrate(self, data: SegmentationRequest, timer) -> float:
+        """Pixels per cm from the first plate segment (default scale without one)"""
         for seg in data.segments:
             if seg.class_name == 'plate':
-                poly = np.array(seg.polygon, dtype=np.int32)
-                pixels_per_cm = self.estimator.calibrate_from_plate(poly, w, h, 24.0)
-                break
+                with timer.stage('polygon_decode'):
+                    poly = np.array(seg.polygon, dtype=np.int32)
+                with timer.stage('calibration'):
+                    return self.estimator.calibrate_from_plate(poly, data.width, data.height, 24.0)
         
-        if pixels_per_cm is None:
-             pixels_per_cm = (w * 0.7) / 24.0 # Default fallback
-             
-        results = []
+        return (data.width * 0.7) / 24.0 # Default fallback
+    
+    def food_polygons(self, data: SegmentationRequest, timer) -> List[tuple]:
+        """(food_type, polygon) of every non-plate segment with at least 3 points"""
+        foods = []
         for seg in data.segments:
             if seg.class_name == 'plate': 
                 continue
                 
-            poly = np.array(seg.polygon, dtype=np.int32)
+            with timer.stage('polygon_decode'):
+                poly = np.array(seg.polygon, dtype=np.int32)
             if len(poly) < 3: continue
             
-            # Simple heuristic for height/type since we don't have the original image for color analysis here
-            # In a real scenario, we might want to pass image data too, or trust the segmentation class
-            food_type = seg.class_name
-            density = FOOD_DENSITY.get(food_type, FOOD_DENSITY['default'])
-            
-            # Height estimation (simplified)
-            height_cm = 3.0
-            
+            foods.append((seg.class_name, poly))
+        return foods
+    
+    @staticmethod
+    def food_result(food_type: str, volume: float) -> Dict[str, Any]:
+        # Simple heuristic for type since we don't have the original image for color analysis here
+        # In a real scenario, we might want to pass image data too, or trust the segmentation class
+        density = FOOD_DENSITY.get(food_type, FOOD_DENSITY['default'])
+        weight = volume * density
+        return {
+            "food": food_type,
+            "weight": weight,
+            "volume_cm3": volume,
+            "calories": int(weight * 1.5) # Mock calories
+        }
+
+    def response_key(self, data: SegmentationRequest, engine: Optional[str] = None) -> str:
+        """Response cache key: canonical segmentation, engine and estimator settings"""
+        return self.estimator.cache_key('segmentation', engine or self.estimator.engine,
+                                        canonical_segmentation_hash(data))
+
+    @staticmethod
+    def generation() -> str:
+        """Hash of the module-level state results depend on besides the request"""
+        return ResultCache.make_key(ESTIMATOR_VERSION, json.dumps(FOOD_DENSITY, sort_keys=True))
+
+    def model(self, data: SegmentationRequest, engine: str, timer) -> List[Dict[str, Any]]:
+        """Food results of one segmentation, without the result cache"""
+        w = data.width
+        h = data.height
+        
+        # Try to find plate to calibrate
+        pixels_per_cm = self.calibrate(data, timer)
+             
+        results = []
+        for food_type, poly in self.food_polygons(data, timer):
             try:
-                mesh = self.estimator.create_mesh_from_polygon(poly, (w, h), height_cm, pixels_per_cm)
-                volume = self.estimator.calculate_volume(mesh)
-                weight = volume * density
-                
-                results.append({
-                    "food": food_type,
-                    "weight": weight,
-                    "volume_cm3": volume,
-                    "calories": int(weight * 1.5) # Mock calories
-                })
+                volume, _ = self.estimator.estimate_volume(poly, (w, h), FOOD_HEIGHT_CM, pixels_per_cm,
+                                                           engine=engine, timer=timer)
+                results.append(self.food_result(food_type, volume))
             except Exception as e:
                 print(f"Error modeling object: {e}")
+        return results
+    
+    def warm_up(self, engine: Optional[str] = None) -> int:
+        """
+        Model a synthetic request (no caches, no timings) so lazy imports and
+        first-call initialization happen before real traffic. Returns the worker pid
+        """
+        results = self.model(warmup_segmentation(), engine or self.estimator.engine, NULL_TIMER)
+        if not results:
+            raise RuntimeError("Warm-up request produced no results")
+        return os.getpid()
+
+    def process(self, data: SegmentationRequest, engine: Optional[str] = None):
+        timer = self.estimator.instrumentation.timer('model')
+        engine = engine or self.estimator.engine
+        
+        cache = self.estimator.result_cache
+        cache_key = None
+        if cache is not None:
+            with timer.stage('cache_lookup'):
+                cache_key = self.response_key(data, engine)
+                cached = cache.get(cache_key)
+            if cached is not None:
+                record = timer.finish()
+                if record is not None:
+                    return {"results": cached, "timings": record}
+                return {"results": cached}
+        
+        results = self.model(data, engine, timer)
                 
+        if cache_key is not None:
+            cache.put(cache_key, results)
+        
+        record = timer.finish()
+        if record is not None:
+            return {"results": results, "timings": record}
         return {"results": results}
 
-logic = ModelingLogic()
+    def process_batch(self, items: List[SegmentationRequest], engine: Optional[str] = None):
+        """
+        Model many segmentations in one pass: every item is decoded and calibrated
+        first, then all meshes of all items are integrated together. Results come
+        back in request order, one {"results": [...]} or {"error": "..."} per item
+        """
+        timer = self.estimator.instrumentation.timer('model_batch')
+        engine = engine or self.estimator.engine
+        cache = self.estimator.result_cache
+        
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        cache_keys: List[Optional[str]] = [None] * len(items)
+        # [item index, food_type, volume]: mesh volumes are filled in by one batched pass
+        objects = []
+        meshes = []
+        mesh_slots = []
+        
+        for i, data in enumerate(items):
+            try:
+                if cache is not None:
+                    with timer.stage('cache_lookup'):
+                        cache_key = self.response_key(data, engine)
+                        cached = cache.get(cache_key)
+                    if cached is not None:
+                        responses[i] = {"results": cached}
+                        continue
+                    cache_keys[i] = cache_key
+                
+                pixels_per_cm = self.calibrate(data, timer)
+                foods = self.food_polygons(data, timer)
+            except Exception as e:
+                responses[i] = {"error": str(e)}
+                continue
+            
+            for food_type, poly in foods:
+                try:
+                    if engine == 'raster':
+                        with timer.stage('volume'):
+                            volume = self.estimator.raster_volume(poly, FOOD_HEIGHT_CM, pixels_per_cm)
+                        objects.append([i, food_type, volume])
+                    else:
+                        with timer.stage('mesh_build'):
+                            meshes.append(self.estimator.create_mesh_from_polygon(
+                                poly, (data.width, data.height), FOOD_HEIGHT_CM, pixels_per_cm))
+                        mesh_slots.append(len(objects))
+                        objects.append([i, food_type, None])
+                except Exception as e:
+                    print(f"Error modeling object: {e}")
+        
+        with timer.stage('volume'):
+            volumes = self.estimator.calculate_volumes(meshes)
+        for slot, volume in zip(mesh_slots, volumes.tolist()):
+            objects[slot][2] = volume
+        
+        for i in range(len(items)):
+            if responses[i] is None:
+                responses[i] = {"results": []}
+        for i, food_type, volume in objects:
+            responses[i]["results"].append(self.food_result(food_type, volume))
+        
+        for key, response in zip(cache_keys, responses):
+            if key is not None and "results" in response:
+                cache.put(key, response["results"])
+        
+        record = timer.finish()
+        if record is not None:
+            return {"results": responses, "timings": record}
+        return {"results": responses}
+
+# Per-process ModelingLogic of process pool workers, created by the pool initializer
+_worker_logic: Optional[ModelingLogic] = None
+
+def _init_worker(logic_kwargs: Dict[str, Any]):
+    global _worker_logic
+    _worker_logic = ModelingLogic(**logic_kwargs)
+
+def _run_in_worker(method: str, args: tuple):
+    """Run a ModelingLogic method in a worker process, with the worker's cache counter deltas"""
+    result = getattr(_worker_logic, method)(*args)
+    cache = _worker_logic.estimator.result_cache
+    return result, cache.take_counters() if cache is not None else {}
+
+class ModelingBusy(Exception):
+    """Raised when the modeling pool admission limit is reached"""
+
+class ModelingPool:
+    """
+    Runs ModelingLogic calls off the event loop in a thread or process pool.
+    At most max_pending calls are admitted (running or queued); further calls
+    are rejected right away with ModelingBusy instead of queueing without bound.
+    A pool broken by a dead worker (OOM kill, native crash) is replaced on the next call
+    """
+    KINDS = ('thread', 'process')
+
+    def __init__(self, logic: ModelingLogic, logic_kwargs: Dict[str, Any], kind: str = 'thread',
+                 workers: int = 1, max_pending: int = 4):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown pool kind: {kind} (expected one of {self.KINDS})")
+        self.logic = logic
+        self.logic_kwargs = logic_kwargs
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor: Optional[Executor] = None
+        # Set whenever a call finishes, created lazily on the running event loop
+        self._released: Optional[asyncio.Event] = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                     initargs=(self.logic_kwargs,))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='modeling')
+        return self._executor
+
+    async def run(self, method: str, *args):
+        """Run logic.<method>(*args) in the pool, or raise ModelingBusy when the admission limit is reached"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ModelingBusy()
+
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        executor = self.executor
+        try:
+            if self.kind == 'process':
+                result, cache_counters = await loop.run_in_executor(executor, _run_in_worker, method, args)
+                # Fold worker-side timings and cache counters into this process's /timings and /cache
+                if isinstance(result, dict) and "timings" in result:
+                    self.logic.estimator.instrumentation.add_record(result["timings"])
+                if cache_counters and self.logic.estimator.result_cache is not None:
+                    self.logic.estimator.result_cache.merge_counters(cache_counters)
+            else:
+                result = await loop.run_in_executor(executor, getattr(self.logic, method), *args)
+        except BrokenExecutor:
+            # Calls in flight fail with the pool; drop it so the next call starts fresh workers
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            metrics.POOL_CALL_LATENCY.labels(method).observe(time.perf_counter() - start)
+            self.pending -= 1
+            self.completed += 1
+            if self._released is not None:
+                self._released.set()
+        return result
+
+    async def run_queued(self, method: str, *args):
+        """Like run, but waits for admission instead of raising ModelingBusy (bulk jobs)"""
+        while self.pending >= self.max_pending:
+            if self._released is None:
+                self._released = asyncio.Event()
+            self._released.clear()
+            await self._released.wait()
+        return await self.run(method, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        running = min(self.pending, self.workers)
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "running": running,
+            "queue_depth": self.pending - running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# MODELING_INSTRUMENTATION=1 enables per-stage timings (per-response and aggregated at /timings),
+# MODELING_TRACK_ALLOCATIONS=1 adds per-stage peak allocations (tracemalloc, noticeably slower)
+# MODELING_CACHE_DIR enables the on-disk result cache (can be shared with process_directory)
+# MODELING_ENGINE selects the default volume engine ('mesh' or 'raster'), /model?engine= overrides it
+logic_kwargs = dict(
+    instrument=os.getenv("MODELING_INSTRUMENTATION", "0") == "1",
+    track_allocations=os.getenv("MODELING_TRACK_ALLOCATIONS", "0") == "1",
+    cache_dir=os.getenv("MODELING_CACHE_DIR") or None,
+    cache_max_mb=float(os.getenv("MODELING_CACHE_MAX_MB", 1024)),
+    engine=os.getenv("MODELING_ENGINE", "mesh")
+)
+logic = ModelingLogic(**logic_kwargs)
+
+# MODELING_SERVER_WORKERS > 1 runs that many uvicorn worker processes on one port. Every worker
+# imports this module with the same environment, so configuration is shared (and so is the
+# on-disk result cache with MODELING_CACHE_DIR); pools and in-memory caches are per worker
+SERVER_WORKERS = max(1, int(os.getenv("MODELING_SERVER_WORKERS", 1)))
+
+# Modeling runs in a pool so the event loop (and /health) never blocks on it:
+# MODELING_EXECUTOR=thread|process, MODELING_POOL_WORKERS workers (default: CPUs split
+# between server workers), at most MODELING_MAX_PENDING requests running or queued
+# (others get 503 + Retry-After)
+pool_workers = int(os.getenv("MODELING_POOL_WORKERS", max(1, (os.cpu_count() or 1) // SERVER_WORKERS)))
+pool = ModelingPool(
+    logic,
+    logic_kwargs,
+    kind=os.getenv("MODELING_EXECUTOR", "thread"),
+    workers=pool_workers,
+    max_pending=int(os.getenv("MODELING_MAX_PENDING", 4 * pool_workers))
+)
+RETRY_AFTER_S = os.getenv("MODELING_RETRY_AFTER", "1")
+
+# In-process response cache in front of the pool (hits skip the queue): LRU of
+# MODELING_RESPONSE_CACHE_SIZE entries (0 disables it) living MODELING_RESPONSE_CACHE_TTL seconds.
+# Keys include the estimator settings; entries are also dropped when FOOD_DENSITY or
+# ESTIMATOR_VERSION change, or on POST /cache/invalidate
+response_cache_size = int(os.getenv("MODELING_RESPONSE_CACHE_SIZE", 1024))
+response_cache = MemoryCache(
+    max_entries=response_cache_size,
+    ttl_s=float(os.getenv("MODELING_RESPONSE_CACHE_TTL", 300))
+) if response_cache_size > 0 else None
+
+def cached_response_key(data: SegmentationRequest, engine: Optional[str]) -> Optional[str]:
+    """Response cache key of a request, None when the cache is disabled or the request can't be hashed"""
+    if response_cache is None:
+        return None
+    response_cache.set_generation(logic.generation())
+    try:
+        return logic.response_key(data, engine)
+    except Exception:
+        return None
+
+@app.exception_handler(ModelingBusy)
+async def modeling_busy_handler(request: Request, exc: ModelingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Modeling queue is full, retry later", **pool.stats()},
+        headers={"Retry-After": RETRY_AFTER_S}
+    )
+
+# Readiness: at startup a synthetic request is modeled in the background (in every process
+# pool worker) and GET /ready answers 503 until it has finished. MODELING_WARMUP=0 skips it
+WARMUP_ENABLED = os.getenv("MODELING_WARMUP", "1") == "1"
+readiness: Dict[str, Any] = {"status": "warming_up" if WARMUP_ENABLED else "ready"}
+
+async def warm_up():
+    start = time.perf_counter()
+    runs = min(pool.workers if pool.kind == 'process' else 1, pool.max_pending)
+    try:
+        pids = await asyncio.gather(*(pool.run('warm_up') for _ in range(runs)))
+    except Exception as e:
+        print(f"Warm-up failed: {e!r}")
+        readiness.update(status="failed", error=repr(e))
+        return
+    readiness.update(status="ready", warmup_s=round(time.perf_counter() - start, 3),
+                     warmed_workers=len(set(pids)))
+
+@app.on_event("startup")
+async def start_warm_up():
+    if WARMUP_ENABLED:
+        # Keep a reference so the task is not garbage collected while running
+        app.state.warmup_task = asyncio.ensure_future(warm_up())
+
+@app.on_event("shutdown")
+def shutdown_pool():
+    pool.shutdown()
+
+async def model_cached(data: SegmentationRequest, engine: Optional[str], run=None) -> Dict[str, Any]:
+    """Response for one segmentation from the response cache, or modeled with run (pool.run by default)"""
+    key = cached_response_key(data, engine)
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return {"results": cached}
+    
+    response = await (run or pool.run)('process', data, engine)
+    if key is not None:
+        response_cache.put(key, response["results"])
+    return response
 
 @app.post("/model")
-async def create_model(data: SegmentationRequest):
-    return logic.process(data)
+async def create_model(data=Depends(read_segmentation), engine: Optional[str] = None):
+    if engine is not None and engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown engine: {engine} (expected one of {list(ENGINES)})")
+    return await model_cached(data, engine)
+
+@app.post("/model/batch")
+async def create_models(data: BatchSegmentationRequest, engine: Optional[str] = None):
+    if engine is not None and engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown engine: {engine} (expected one of {list(ENGINES)})")
+    items: List[Optional[SegmentationRequest]] = [None] * len(data.items)
+    responses: List[Optional[Dict[str, Any]]] = [None] * len(data.items)
+    for i, value in enumerate(data.items):
+        try:
+            items[i] = validate_segmentation(value)
+        except ValidationError as e:
+            responses[i] = {"error": str(e)}
+    
+    keys = [cached_response_key(item, engine) if item is not None else None for item in items]
+    for i, key in enumerate(keys):
+        cached = response_cache.get(key) if key is not None else None
+        if cached is not None:
+            responses[i] = {"results": cached}
+    misses = [i for i, response in enumerate(responses) if response is None]
+    if not misses:
+        return {"results": responses}
+    
+    batch = await pool.run('process_batch', [items[i] for i in misses], engine)
+    for i, response in zip(misses, batch["results"]):
+        responses[i] = response
+        if keys[i] is not None and "results" in response:
+            response_cache.put(keys[i], response["results"])
+    batch["results"] = responses
+    return batch
+
+# Segmentations of one /model/stream job modeled at once (default: one per pool worker);
+# keep it below MODELING_MAX_PENDING so bulk jobs leave room for interactive requests.
+# The job body is spooled to a temporary file past MODELING_STREAM_SPOOL_MB
+STREAM_WINDOW = max(1, int(os.getenv("MODELING_STREAM_WINDOW", pool.workers)))
+STREAM_SPOOL_BYTES = int(float(os.getenv("MODELING_STREAM_SPOOL_MB", 8)) * 1024 * 1024)
+
+async def stream_record(index: int, line: bytes, engine: Optional[str]) -> bytes:
+    """One NDJSON output line: {"index": ..., "results": [...]} or {"index": ..., "error": "..."}"""
+    try:
+        data = parse_segmentation_json(line)
+        response = await model_cached(data, engine, run=pool.run_queued)
+    except Exception as e:
+        response = {"error": str(e)}
+    return (json.dumps({"index": index, **response}) + "\n").encode()
+
+async def stream_records(spool, engine: Optional[str]) -> AsyncIterator[bytes]:
+    """
+    Model the spooled NDJSON lines with at most STREAM_WINDOW in flight and emit records in
+    input order. Lines are read only as output is consumed, so memory stays bounded by the window
+    """
+    window = deque()
+    try:
+        index = 0
+        for line in spool:
+            if not line.strip():
+                continue
+            window.append(asyncio.ensure_future(stream_record(index, line, engine)))
+            index += 1
+            if len(window) >= STREAM_WINDOW:
+                yield await window.popleft()
+        while window:
+            yield await window.popleft()
+    finally:
+        # Client went away: stop modeling what nobody will read
+        for task in window:
+            task.cancel()
+        spool.close()
+
+@app.post("/model/stream")
+async def stream_models(request: Request, engine: Optional[str] = None):
+    """
+    Bulk modeling: NDJSON body (one SegmentationRequest per line) in, one NDJSON record per
+    line out, in input order, each sent as soon as it and all earlier lines are done
+    """
+    if engine is not None and engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown engine: {engine} (expected one of {list(ENGINES)})")
+    # The body is read up front: while streaming, the response owns the receive channel
+    spool = await spool_body(request, STREAM_SPOOL_BYTES)
+    return StreamingResponse(stream_records(spool, engine), media_type="application/x-ndjson")
+
+@app.get("/queue")
+async def queue_stats():
+    return pool.stats()
+
+@app.get("/timings")
+async def timings():
+    return {
+        "enabled": logic.estimator.instrumentation.enabled,
+        "counters": logic.estimator.instrumentation.snapshot()
+    }
+
+@app.get("/cache")
+async def cache_stats():
+    cache = logic.estimator.result_cache
+    stats = {"enabled": True, **cache.stats()} if cache is not None else {"enabled": False}
+    stats["memory"] = {"enabled": True, **response_cache.stats()} if response_cache is not None else {"enabled": False}
+    return stats
+
+@app.post("/cache/invalidate")
+async def invalidate_cache():
+    """Drop every in-process response cache entry (e.g. after editing FOOD_DENSITY in place)"""
+    if response_cache is not None:
+        response_cache.clear()
+    return await cache_stats()
+
+metrics.register(metrics.StatsCollector(
+    pool_stats=pool.stats,
+    cache_stats=lambda: {
+        "disk": logic.estimator.result_cache.stats() if logic.estimator.result_cache is not None else None,
+        "memory": response_cache.stats() if response_cache is not None else None,
+    },
+    stage_snapshot=logic.estimator.instrumentation.snapshot
+))
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text format: request latencies, pool, caches and (with instrumentation) stages"""
+    body, content_type = metrics.exposition()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """200 once warm-up has finished, 503 while warming up (or if it failed)"""
+    status_code = 200 if readiness["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content={**readiness, "pid": os.getpid()})
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 3002))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if SERVER_WORKERS > 1:
+        # Multiple workers need an import string: each worker imports server:app itself
+        uvicorn.run("server:app", host="0.0.0.0", port=port, workers=SERVER_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
 
@@ -0,0 +1,67 @@
+"""
+Parity of the vectorized mesh volume against the original per-triangle loop
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from food_weight import FoodWeightEstimator  # noqa: E402
+
+IMAGE_SIZE = (1280, 960)
+PIXELS_PER_CM = 11.0
+
+
+def loop_volume(mesh) -> float:
+    """Volume (cm³) as the original implementation computed it, one triangle at a time"""
+    vertices = np.asarray(mesh.vertices)
+    triangles = np.asarray(mesh.triangles)
+
+    volume = 0.0
+    for tri in triangles:
+        v0, v1, v2 = vertices[tri]
+        volume += np.dot(v0, np.cross(v1, v2)) / 6.0
+
+    return abs(volume) * 1_000_000
+
+
+def random_polygon(rng: np.random.Generator) -> np.ndarray:
+    """Star-shaped polygon with jittered radii, in integer pixels as parsed from YOLO labels"""
+    n = int(rng.integers(3, 200))
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    radii = rng.uniform(20, 300, n)
+    center = rng.uniform([300, 300], [IMAGE_SIZE[0] - 300, IMAGE_SIZE[1] - 300])
+    points = center + np.column_stack([np.cos(angles), np.sin(angles)]) * radii[:, None]
+    return points.astype(np.int32)
+
+
+@pytest.fixture
+def meshes():
+    rng = np.random.default_rng(0)
+    estimator = FoodWeightEstimator()
+    return [
+        estimator.create_mesh_from_polygon(random_polygon(rng), IMAGE_SIZE, float(rng.uniform(0.5, 6.0)),
+                                           PIXELS_PER_CM)
+        for _ in range(50)
+    ]
+
+
+def test_calculate_volume_matches_loop(meshes):
+    estimator = FoodWeightEstimator()
+    for mesh in meshes:
+        expected = loop_volume(mesh)
+        assert estimator.calculate_volume(mesh) == pytest.approx(expected, rel=1e-12)
+
+
+def test_calculate_volumes_matches_loop(meshes):
+    estimator = FoodWeightEstimator()
+    expected = np.array([loop_volume(mesh) for mesh in meshes])
+    np.testing.assert_allclose(estimator.calculate_volumes(meshes), expected, rtol=1e-12)
+
+
+def test_calculate_volumes_empty():
+    assert FoodWeightEstimator().calculate_volumes([]).shape == (0,)
@@ -0,0 +1,137 @@
+"""
+Compact binary segmentation format for /model
+Polygons travel as one packed coordinate buffer plus per-segment point offsets
+instead of nested JSON lists, and decode into numpy views of the request body.
+
+Layout (little-endian):
+    header       magic b"SEGB", u8 version, u8 coord type (1 = int16, 2 = float32),
+                 u16 class name count, u32 width, u32 height, u32 segment count,
+                 u32 point count, u32 class names size (28 bytes)
+    class names  UTF-8, newline separated, zero padded to 4 bytes
+    class index  u16 per segment (into class names), zero padded to 4 bytes
+    confidence   f32 per segment
+    offsets      u32 per segment + 1, point offsets of each segment
+    coords       x, y per point (int16 or float32)
+
+int16 coordinates are truncated to whole pixels, which is lossless for the
+estimator: it truncates polygons to the integer pixel grid anyway
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CONTENT_TYPE = 'application/x-segmentation'
+MAGIC = b'SEGB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHIIIII')
+
+COORD_INT16 = 1
+COORD_FLOAT32 = 2
+COORD_DTYPES = {
+    COORD_INT16: np.dtype('<i2'),
+    COORD_FLOAT32: np.dtype('<f4'),
+}
+
+
+@dataclass
+class PackedSegment:
+    """Segment with the same attributes as SegmentationItem; polygon is an (n, 2) view"""
+    class_name: str
+    polygon: np.ndarray
+    confidence: float = 1.0
+
+
+@dataclass
+class PackedSegmentation:
+    """Decoded request with the same attributes as SegmentationRequest"""
+    width: int
+    height: int
+    segments: List[PackedSegment]
+
+
+def _padding(size: int) -> int:
+    return -size % 4
+
+
+def encode_segmentation(width: int, height: int,
+                        segments: Iterable[Tuple[str, Sequence, float]],
+                        coord_type: Optional[int] = None) -> bytes:
+    """
+    Encode (class_name, polygon, confidence) segments
+    coord_type defaults to int16 when every coordinate fits, float32 otherwise
+    """
+    segments = list(segments)
+    polygons = [np.asarray(polygon, dtype=np.float64).reshape(-1, 2) for _, polygon, _ in segments]
+    coords = np.concatenate(polygons) if polygons else np.zeros((0, 2))
+
+    if coord_type is None:
+        in_range = coords.size == 0 or (coords.min() > -32769 and coords.max() < 32768)
+        coord_type = COORD_INT16 if in_range else COORD_FLOAT32
+    coords = np.trunc(coords) if coord_type == COORD_INT16 else coords
+    coords = coords.astype(COORD_DTYPES[coord_type])
+
+    names = list(dict.fromkeys(class_name for class_name, _, _ in segments))
+    names_blob = "\n".join(names).encode('utf-8')
+    name_index = {name: i for i, name in enumerate(names)}
+    class_index = np.array([name_index[class_name] for class_name, _, _ in segments], dtype='<u2')
+    confidence = np.array([confidence for _, _, confidence in segments], dtype='<f4')
+    offsets = np.zeros(len(segments) + 1, dtype='<u4')
+    np.cumsum([len(polygon) for polygon in polygons], out=offsets[1:])
+
+    return b''.join([
+        HEADER.pack(MAGIC, VERSION, coord_type, len(names), width, height,
+                    len(segments), len(coords), len(names_blob)),
+        names_blob, b'\0' * _padding(len(names_blob)),
+        class_index.tobytes(), b'\0' * _padding(class_index.nbytes),
+        confidence.tobytes(),
+        offsets.tobytes(),
+        coords.tobytes(),
+    ])
+
+
+def decode_segmentation(body: bytes) -> PackedSegmentation:
+    """Decode a request body; polygons are views into body (no copies). Raises ValueError if malformed"""
+    if len(body) < HEADER.size:
+        raise ValueError("truncated header")
+    magic, version, coord_type, n_names, width, height, n_segments, n_points, names_size = \
+        HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("bad magic")
+    if version != VERSION:
+        raise ValueError(f"unsupported version {version}")
+    if coord_type not in COORD_DTYPES:
+        raise ValueError(f"unknown coordinate type {coord_type}")
+
+    dtype = COORD_DTYPES[coord_type]
+    position = HEADER.size
+    names_end = position + names_size
+    class_index_at = names_end + _padding(names_size)
+    confidence_at = class_index_at + 2 * n_segments + _padding(2 * n_segments)
+    offsets_at = confidence_at + 4 * n_segments
+    coords_at = offsets_at + 4 * (n_segments + 1)
+    end = coords_at + 2 * n_points * dtype.itemsize
+    if len(body) != end:
+        raise ValueError(f"expected {end} bytes, got {len(body)}")
+
+    names = body[position:names_end].decode('utf-8').split("\n") if n_names else []
+    if len(names) != n_names:
+        raise ValueError("class name count mismatch")
+
+    class_index = np.frombuffer(body, dtype='<u2', count=n_segments, offset=class_index_at)
+    confidence = np.frombuffer(body, dtype='<f4', count=n_segments, offset=confidence_at)
+    offsets = np.frombuffer(body, dtype='<u4', count=n_segments + 1, offset=offsets_at)
+    coords = np.frombuffer(body, dtype=dtype, count=2 * n_points, offset=coords_at).reshape(-1, 2)
+
+    if offsets[0] != 0 or offsets[-1] != n_points or np.any(np.diff(offsets.astype(np.int64)) < 0):
+        raise ValueError("inconsistent point offsets")
+    if n_segments and class_index.max() >= n_names:
+        raise ValueError("class index out of range")
+
+    segments = [
+        PackedSegment(names[class_index[i]], coords[offsets[i]:offsets[i + 1]], float(confidence[i]))
+        for i in range(n_segments)
+    ]
+    return PackedSegmentation(width=width, height=height, segments=segments)
@@ -1,54 +1,289 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
 import aiohttp
+import asyncio
 import uvicorn
 import os
 import json
+import struct
+import sys
+import time
+from array import array
+from contextlib import contextmanager
 from typing import List, Optional
 
 app = FastAPI(title="Grams Service")
 
+# Prometheus metrics, served on GET /metrics
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+REQUESTS = Counter('grams_http_requests_total', 'HTTP requests by route and status code', ['method', 'route', 'status'])
+REQUEST_LATENCY = Histogram('grams_http_request_duration_seconds', 'HTTP request latency',
+                            ['method', 'route'], buckets=LATENCY_BUCKETS)
+IN_PROGRESS = Gauge('grams_http_requests_in_progress', 'HTTP requests being served', ['method', 'route'])
+DOWNSTREAM_LATENCY = Histogram('grams_downstream_request_duration_seconds',
+                               'Calls to the segmentation and modeling services', ['service'],
+                               buckets=LATENCY_BUCKETS)
+DOWNSTREAM_ERRORS = Counter('grams_downstream_errors_total', 'Failed downstream calls', ['service', 'reason'])
+IMAGES = Counter('grams_images_total', 'Images processed by /calculate', ['outcome'])
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count of every HTTP request"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope['method']
+        # Route template rather than the raw path, to keep label values bounded
+        route = next((r.path for r in scope['app'].router.routes if r.matches(scope)[0] == Match.FULL), 'unmatched')
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        IN_PROGRESS.labels(method, route).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, route, str(status)).inc()
+            IN_PROGRESS.labels(method, route).dec()
+
+app.add_middleware(MetricsMiddleware)
+
+@contextmanager
+def downstream(service: str):
+    """Time a downstream call; exceptions are counted as errors and re-raised, cancelled calls are not counted"""
+    start = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        DOWNSTREAM_ERRORS.labels(service, type(e).__name__).inc()
+        DOWNSTREAM_LATENCY.labels(service).observe(time.perf_counter() - start)
+        raise
+    DOWNSTREAM_LATENCY.labels(service).observe(time.perf_counter() - start)
+
 # URLs of dependent services
 # Assuming 3dmodels is running on 3002
 # Assuming segmentation is running on 3001 (or mocked)
 SEGMENTATION_SERVICE_URL = os.getenv("SEGMENTATION_SERVICE_URL", "http://localhost:3001")
 AUTO_MODELING_SERVICE_URL = os.getenv("AUTO_MODELING_SERVICE_URL", "http://localhost:3002")
 
+# Downstream HTTP client: one pooled session for the app lifetime (keep-alive connections reused
+# across requests). Connections per service host / in total, idle keep-alive and DNS cache lifetimes,
+# connect and per-read timeouts, all in seconds
+DOWNSTREAM_LIMIT_PER_HOST = int(os.getenv("DOWNSTREAM_LIMIT_PER_HOST", 32))
+DOWNSTREAM_LIMIT = int(os.getenv("DOWNSTREAM_LIMIT", 100))
+DOWNSTREAM_KEEPALIVE_S = float(os.getenv("DOWNSTREAM_KEEPALIVE_S", 60))
+DOWNSTREAM_DNS_TTL_S = int(os.getenv("DOWNSTREAM_DNS_TTL_S", 300))
+DOWNSTREAM_CONNECT_TIMEOUT_S = float(os.getenv("DOWNSTREAM_CONNECT_TIMEOUT_S", 5))
+DOWNSTREAM_READ_TIMEOUT_S = float(os.getenv("DOWNSTREAM_READ_TIMEOUT_S", 60))
+
+http_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """The shared downstream session, created on first use (must be called on the event loop)"""
+    global http_session
+    if http_session is None or http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=DOWNSTREAM_LIMIT,
+            limit_per_host=DOWNSTREAM_LIMIT_PER_HOST,
+            keepalive_timeout=DOWNSTREAM_KEEPALIVE_S,
+            ttl_dns_cache=DOWNSTREAM_DNS_TTL_S,
+        )
+        timeout = aiohttp.ClientTimeout(sock_connect=DOWNSTREAM_CONNECT_TIMEOUT_S,
+                                        sock_read=DOWNSTREAM_READ_TIMEOUT_S)
+        http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return http_session
+
+@app.on_event("startup")
+async def open_http_session():
+    get_session()
+
+@app.on_event("shutdown")
+async def close_http_session():
+    global http_session
+    if http_session is not None:
+        await http_session.close()
+        http_session = None
+
+# Uploads are streamed to the segmentation service in UPLOAD_CHUNK_KB chunks instead of being read
+# into memory; images over MAX_UPLOAD_MB are rejected with 413
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", 20)) * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_KB", 64)) * 1024
+
+class UploadTooLarge(Exception):
+    """An uploaded image exceeds MAX_UPLOAD_BYTES"""
+
+class UploadStream:
+    """Async iterable over an upload in chunks, for use as a streamed multipart field"""
+    
+    def __init__(self, upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.upload = upload
+        self.max_bytes = max_bytes
+        self.too_large = False
+    
+    async def __aiter__(self):
+        await self.upload.seek(0)
+        sent = 0
+        while True:
+            chunk = await self.upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                return
+            sent += len(chunk)
+            if sent > self.max_bytes:
+                # Flag it too: the HTTP client may wrap the exception raised while sending
+                self.too_large = True
+                raise UploadTooLarge(self.upload.filename)
+            yield chunk
+
+def upload_size(image: UploadFile) -> Optional[int]:
+    """Size of an upload (already spooled by the multipart parser), None if unknown"""
+    try:
+        position = image.file.tell()
+        size = image.file.seek(0, os.SEEK_END)
+        image.file.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+# Images of one /calculate request processed at the same time
+CALCULATE_CONCURRENCY = max(1, int(os.getenv("CALCULATE_CONCURRENCY", 3)))
+
+# Format of segmentations sent to the modeling service: "json" or "binary"
+# (packed polygons, see 3dmodles/open3d/wire_format.py; much cheaper to decode for dense masks)
+MODELING_WIRE_FORMAT = os.getenv("MODELING_WIRE_FORMAT", "json")
+SEGMENTATION_CONTENT_TYPE = "application/x-segmentation"
+SEGMENTATION_HEADER = struct.Struct('<4sBBHIIIII')
+
+def encode_segmentation(data: dict) -> bytes:
+    """
+    Encode a segmentation response ({width, height, segments}) in the modeling
+    service's binary format: int16 coordinates (truncated, as the modeling
+    service does) when every coordinate fits, float32 otherwise
+    """
+    segments = data.get('segments', [])
+    names = list(dict.fromkeys(seg['class_name'] for seg in segments))
+    name_index = {name: i for i, name in enumerate(names)}
+    names_blob = "\n".join(names).encode('utf-8')
+    
+    values = [float(v) for seg in segments for point in seg['polygon'] for v in (point[0], point[1])]
+    if all(-32769 < v < 32768 for v in values):
+        coord_type, coords = 1, array('h', [int(v) for v in values])
+    else:
+        coord_type, coords = 2, array('f', values)
+    
+    class_index = array('H', [name_index[seg['class_name']] for seg in segments])
+    confidence = array('f', [seg.get('confidence', 1.0) for seg in segments])
+    offsets = array('I', [0])
+    for seg in segments:
+        offsets.append(offsets[-1] + len(seg['polygon']))
+    
+    if sys.byteorder == 'big':
+        for part in (coords, class_index, confidence, offsets):
+            part.byteswap()
+    
+    def padding(size: int) -> bytes:
+        return b'\0' * (-size % 4)
+    
+    return b''.join([
+        SEGMENTATION_HEADER.pack(b'SEGB', 1, coord_type, len(names), data['width'], data['height'],
+                                 len(segments), len(values) // 2, len(names_blob)),
+        names_blob, padding(len(names_blob)),
+        class_index.tobytes(), padding(len(class_index) * 2),
+        confidence.tobytes(),
+        offsets.tobytes(),
+        coords.tobytes(),
+    ])
+
+async def process_image(session: aiohttp.ClientSession, image: UploadFile) -> Optional[dict]:
+    """Segmentation then modeling of one image; None (logged) if any step fails"""
+    upload = UploadStream(image)
+    try:
+        # 1. Send to Segmentation Service (the upload is streamed, not read into memory)
+        form_data = aiohttp.FormData()
+        form_data.add_field('image', upload, filename=image.filename, content_type=image.content_type)
+        
+        with downstream("segmentation"):
+            async with session.post(f"{SEGMENTATION_SERVICE_URL}/analyze", data=form_data) as seg_resp:
+                if seg_resp.status != 200:
+                    print(f"Segmentation failed for {image.filename}: {seg_resp.status}")
+                    DOWNSTREAM_ERRORS.labels("segmentation", str(seg_resp.status)).inc()
+                    IMAGES.labels("segmentation_failed").inc()
+                    return None
+                segmentation_data = await seg_resp.json()
+        
+        # 2. Send to Auto Modeling Service
+        if MODELING_WIRE_FORMAT == "binary":
+            model_request = {"data": encode_segmentation(segmentation_data),
+                             "headers": {"Content-Type": SEGMENTATION_CONTENT_TYPE}}
+        else:
+            model_request = {"json": segmentation_data}
+        with downstream("modeling"):
+            async with session.post(f"{AUTO_MODELING_SERVICE_URL}/model", **model_request) as model_resp:
+                if model_resp.status != 200:
+                    print(f"Modeling failed for {image.filename}: {model_resp.status}")
+                    DOWNSTREAM_ERRORS.labels("modeling", str(model_resp.status)).inc()
+                    IMAGES.labels("modeling_failed").inc()
+                    return None
+                modeling_data = await model_resp.json()
+                IMAGES.labels("ok").inc()
+                return modeling_data
+            
+    except Exception as e:
+        if upload.too_large:
+            IMAGES.labels("too_large").inc()
+            raise UploadTooLarge(image.filename) from e
+        print(f"Error processing {image.filename}: {e}")
+        IMAGES.labels("error").inc()
+        return None
+
 @app.post("/calculate")
 async def calculate_grams(images: List[UploadFile] = File(...)):
     """
     Accepts 1-3 images, sends them for segmentation, then for modeling, 
     and finally calculates the average grammage.
+    Images are processed concurrently (at most CALCULATE_CONCURRENCY at a time);
+    a failed image is skipped without affecting the others.
     """
     if not images:
         raise HTTPException(status_code=400, detail="No images provided")
+    for image in images:
+        size = upload_size(image)
+        if size is not None and size > MAX_UPLOAD_BYTES:
+            IMAGES.labels("too_large").inc()
+            raise HTTPException(status_code=413, detail=f"Image {image.filename} exceeds {MAX_UPLOAD_BYTES} bytes")
 
-    results = []
-
-    async with aiohttp.ClientSession() as session:
-        for image in images:
-            try:
-                # 1. Send to Segmentation Service
-                image_content = await image.read()
-                form_data = aiohttp.FormData()
-                form_data.add_field('image', image_content, filename=image.filename, content_type=image.content_type)
-                
-                async with session.post(f"{SEGMENTATION_SERVICE_URL}/analyze", data=form_data) as seg_resp:
-                    if seg_resp.status != 200:
-                        print(f"Segmentation failed for {image.filename}: {seg_resp.status}")
-                        continue
-                    segmentation_data = await seg_resp.json()
-                
-                # 2. Send to Auto Modeling Service
-                async with session.post(f"{AUTO_MODELING_SERVICE_URL}/model", json=segmentation_data) as model_resp:
-                    if model_resp.status != 200:
-                        print(f"Modeling failed for {image.filename}: {model_resp.status}")
-                        continue
-                    modeling_data = await model_resp.json()
-                    results.append(modeling_data)
-                    
-            except Exception as e:
-                print(f"Error processing {image.filename}: {e}")
-                continue
+    session = get_session()
+    limit = asyncio.Semaphore(CALCULATE_CONCURRENCY)
+    
+    async def process_limited(image: UploadFile) -> Optional[dict]:
+        async with limit:
+            return await process_image(session, image)
+    
+    tasks = [asyncio.ensure_future(process_limited(image)) for image in images]
+    try:
+        outcomes = await asyncio.gather(*tasks)
+    except UploadTooLarge as e:
+        # The request has failed: stop the other images instead of modeling them for nothing
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise HTTPException(status_code=413, detail=f"Image {e} exceeds {MAX_UPLOAD_BYTES} bytes")
+    
+    # Results stay in upload order
+    results = [data for data in outcomes if data is not None]
     
     if not results:
         raise HTTPException(status_code=500, detail="Failed to process any images")
@@ -105,6 +340,11 @@ def average_results(results_list: list) -> dict:
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format: request and downstream latencies, errors, per-image outcomes"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 3003))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -1,10 +1,13 @@
 import os
 import hashlib
+import time
+import functools
 import aiohttp
 import aiofiles
 import aiomysql
 from pathlib import Path
 from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, ContextTypes, filters
 
@@ -23,6 +26,81 @@ GRAMS_SERVICE_URL = os.getenv('GRAMS_SERVICE_URL', 'http://localhost:3003')
 TRANSLATIONS_SERVICE_URL = os.getenv('TRANSLATIONS_SERVICE_URL', 'http://localhost:3000')
 PERMISSIONS_TOKEN = os.getenv('PERMISSIONS_TOKEN', '')
 
+# Метрики Prometheus отдаются на http://0.0.0.0:METRICS_PORT/metrics (0 — отключить)
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9103))
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+HANDLER_LATENCY = Histogram('bot_handler_duration_seconds', 'Время обработки апдейта', ['handler'],
+                            buckets=LATENCY_BUCKETS)
+HANDLERS_IN_PROGRESS = Gauge('bot_handlers_in_progress', 'Апдейты в обработке', ['handler'])
+HANDLER_ERRORS = Counter('bot_handler_errors_total', 'Необработанные исключения в обработчиках', ['handler'])
+ANALYSIS_LATENCY = Histogram('bot_analysis_duration_seconds', 'Анализ 3 фото: граммовка, фильтрация, перевод',
+                             buckets=LATENCY_BUCKETS)
+DOWNSTREAM_LATENCY = Histogram('bot_downstream_duration_seconds', 'Вызовы внешних сервисов и MySQL',
+                               ['service', 'operation'], buckets=LATENCY_BUCKETS)
+DOWNSTREAM_ERRORS = Counter('bot_downstream_errors_total', 'Ошибки вызовов внешних сервисов и MySQL',
+                            ['service', 'reason'])
+CACHE_LOOKUPS = Counter('bot_cache_lookups_total', 'Обращения к кэшам бота', ['cache', 'result'])
+
+
+def instrumented(handler):
+    """Оборачивает обработчик телеграма: время, число активных вызовов, исключения"""
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        HANDLERS_IN_PROGRESS.labels(name).inc()
+        start = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            HANDLER_ERRORS.labels(name).inc()
+            raise
+        finally:
+            HANDLER_LATENCY.labels(name).observe(time.perf_counter() - start)
+            HANDLERS_IN_PROGRESS.labels(name).dec()
+
+    return wrapper
+
+
+def timed(service: str, operation: str):
+    """Декоратор: время вызова внешнего сервиса (ошибки считаются в except самих функций)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                DOWNSTREAM_LATENCY.labels(service, operation).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def http_metrics(service: str) -> aiohttp.TraceConfig:
+    """Трассировка aiohttp: время каждого HTTP запроса к сервису, ответы не 2xx и исключения как ошибки"""
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_start(session, ctx, params):
+        ctx.start = time.perf_counter()
+
+    async def on_request_end(session, ctx, params):
+        operation = params.url.query.get('target', params.url.path)
+        DOWNSTREAM_LATENCY.labels(service, operation).observe(time.perf_counter() - ctx.start)
+        if params.response.status >= 300:
+            DOWNSTREAM_ERRORS.labels(service, str(params.response.status)).inc()
+
+    async def on_request_exception(session, ctx, params):
+        operation = params.url.query.get('target', params.url.path)
+        DOWNSTREAM_LATENCY.labels(service, operation).observe(time.perf_counter() - ctx.start)
+        DOWNSTREAM_ERRORS.labels(service, type(params.exception).__name__).inc()
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    return trace
+
+
 # Директория для хранения изображений
 IMAGES_DIR = Path('images')
 IMAGES_DIR.mkdir(exist_ok=True)
@@ -72,6 +150,7 @@ async def init_database():
         print(f"Ошибка инициализации БД: {e}")
 
 
+@timed('mysql', 'save_user')
 async def save_user_info(user):
     """Сохраняет информацию о пользователе в БД"""
     try:
@@ -122,9 +201,11 @@ async def save_user_info(user):
         return True
     except Exception as e:
         print(f"Ошибка сохранения в БД: {e}")
+        DOWNSTREAM_ERRORS.labels('mysql', type(e).__name__).inc()
         return False
 
 
+@timed('mysql', 'check_permission')
 async def check_user_permission(telegram_user_id: int) -> bool:
     """Проверяет права пользователя напрямую из БД
     
@@ -155,9 +236,11 @@ async def check_user_permission(telegram_user_id: int) -> bool:
         conn.close()
     except Exception as e:
         print(f"Ошибка проверки прав: {e}")
+        DOWNSTREAM_ERRORS.labels('mysql', type(e).__name__).inc()
         return False
 
 
+@timed('telegram', 'download')
 async def download_image(file_id: str, file_path: Path, bot) -> bool:
     """Скачивает изображение по file_id"""
     try:
@@ -166,6 +249,7 @@ async def download_image(file_id: str, file_path: Path, bot) -> bool:
         return True
     except Exception as e:
         print(f"Ошибка скачивания изображения: {e}")
+        DOWNSTREAM_ERRORS.labels('telegram', type(e).__name__).inc()
         return False
 
 
@@ -194,10 +278,12 @@ async def get_food_types_from_translations_service() -> set:
     global _food_types_cache
     
     if _food_types_cache is not None:
+        CACHE_LOOKUPS.labels('food_types', 'hit').inc()
         return _food_types_cache
+    CACHE_LOOKUPS.labels('food_types', 'miss').inc()
     
     try:
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[http_metrics('translations')]) as session:
             async with session.get(
                 f"{TRANSLATIONS_SERVICE_URL}/Translations/Alls/V0Get",
                 params={"target": "types"}
@@ -260,7 +346,7 @@ async def translate_ingredient(ingredient_name: str) -> str:
         str: Переведенное название или оригинальное, если перевод не удался
     """
     try:
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[http_metrics('translations')]) as session:
             async with session.get(
                 f"{TRANSLATIONS_SERVICE_URL}/Translations/Alls/V0Get",
                 params={"target": "translations", "term": ingredient_name}
@@ -304,7 +390,7 @@ async def get_item_type_from_translations_service(item_name: str) -> str:
         str: Тип объекта или пустая строка, если не найден
     """
     try:
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[http_metrics('translations')]) as session:
             async with session.get(
                 f"{TRANSLATIONS_SERVICE_URL}/Translations/Alls/V0Get",
                 params={"target": "type", "term": item_name}
@@ -380,7 +466,7 @@ async def filter_food_items(results: list) -> list:
 async def send_to_grams_service(image_paths: list) -> dict:
     """Отправляет список изображений на сервис граммовки (Orchestrator)"""
     try:
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[http_metrics('grams')]) as session:
             form_data = aiohttp.FormData()
             
             # Добавляем все изображения в форму
@@ -569,6 +655,8 @@ async def handle_image(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Отправляем сообщение о начале обработки
         processing_msg = await update.message.reply_text("Анализ изображений и расчет граммов...")
         
+        analysis_start = time.perf_counter()
+        
         # Отправляем все фото сразу в сервис граммовки
         final_result = await send_to_grams_service(session['images'])
         
@@ -585,6 +673,7 @@ async def handle_image(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Форматируем и отправляем результат (с переводом ингредиентов)
         result_text = await format_analysis_result(final_result)
         await processing_msg.edit_text(result_text)
+        ANALYSIS_LATENCY.observe(time.perf_counter() - analysis_start)
         
         # Очищаем сессию
         del user_sessions[user_id]
@@ -612,10 +701,10 @@ def main():
     application = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
     
     # Обработчики команд
-    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("start", instrumented(start)))
     
     # Обработчик кнопок
-    application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(CallbackQueryHandler(instrumented(button_callback)))
     
     # Обработчик изображений (фото и документы с изображениями)
     # Используем комбинированный фильтр для фото и документов-изображений
@@ -624,9 +713,13 @@ def main():
     
     application.add_handler(MessageHandler(
         image_filter,
-        handle_image
+        instrumented(handle_image)
     ))
     
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+        print(f"Метрики: http://0.0.0.0:{METRICS_PORT}/metrics")
+    
     print("Бот запущен...")
     application.run_polling()
 